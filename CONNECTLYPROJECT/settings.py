@@ -70,14 +70,26 @@ SESSION_COOKIE_SECURE = False
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'posts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+# Per-process token -> user+profile cache used by CachedTokenAuthentication.
+# Logout, token rotation and user changes are published in CACHE_ALIAS and
+# checked on every hit, so they apply to all workers at once; TTL (seconds)
+# bounds how long an entry lives otherwise.
+AUTH_TOKEN_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,
+    'CACHE_ALIAS': 'shared',
+}
+
 MIDDLEWARE = [
+    'posts.middleware.RequestMetricsMiddleware',
+    'posts.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -108,13 +120,63 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'CONNECTLYPROJECT.wsgi.application'
 
+# SQLite tuning profiles. PRAGMAS are applied to every new connection by
+# posts.db.configure_sqlite_connection; journal_mode is stored in the database
+# file, the others are per connection. Select one with CONNECTLY_SQLITE_PROFILE;
+# "baseline" keeps SQLite's defaults so benchmarks can compare the two. Deployments
+# should set "tuned". It is not the default because switching to WAL rewrites the
+# database file for good and leaves -wal/-shm files next to it, which would dirty
+# the checked-in development db.sqlite3.
+SQLITE_PROFILES = {
+    'tuned': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # Take the write lock at BEGIN so busy_timeout applies instead of failing
+        # with "database is locked" when a read transaction upgrades to a write.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        'PRAGMAS': {
+            'journal_mode': 'WAL',        # readers no longer block on writers
+            'synchronous': 'NORMAL',      # fsync at checkpoints only; safe with WAL
+            'busy_timeout': 5000,         # ms to wait for a lock before erroring
+            'cache_size': -65536,         # 64 MiB page cache per connection
+            'mmap_size': 268435456,       # 256 MiB memory-mapped reads
+            'temp_store': 'MEMORY',
+        },
+    },
+    'baseline': {
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'OPTIONS': {},
+        'PRAGMAS': {'journal_mode': 'DELETE'},
+    },
+}
+SQLITE_PROFILE = os.environ.get('CONNECTLY_SQLITE_PROFILE', 'baseline')
+_sqlite_profile = SQLITE_PROFILES[SQLITE_PROFILE]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # Override with CONNECTLY_DB_PATH to seed benchmarks into a scratch database.
+        'NAME': os.environ.get('CONNECTLY_DB_PATH', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': _sqlite_profile['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': _sqlite_profile['CONN_HEALTH_CHECKS'],
+        'OPTIONS': _sqlite_profile['OPTIONS'],
     }
 }
 
+# Read replicas, e.g. CONNECTLY_REPLICA_PATHS=replica1.sqlite3,replica2.sqlite3.
+# Locally the sync_replicas command copies the primary into them; in tests they
+# mirror the primary. See posts.routers.PrimaryReplicaRouter.
+DATABASE_REPLICAS = []
+for _index, _path in enumerate(filter(None, os.environ.get('CONNECTLY_REPLICA_PATHS', '').split(',')), 1):
+    _alias = f'replica{_index}'
+    DATABASES[_alias] = {**DATABASES['default'], 'NAME': _path, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['posts.routers.PrimaryReplicaRouter']
+# Seconds a user's reads stay on the primary after they write.
+REPLICA_PIN_SECONDS = 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -131,12 +193,71 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Caching Configuration using Redis
+# Caching: a small per-process LRU in front of a cache shared by all workers.
+# The shared tier is Redis when CONNECTLY_REDIS_URL is set and a file-based cache
+# otherwise; invalidations reach other workers within SYNC_INTERVAL seconds.
+# Production must set CONNECTLY_REDIS_URL. The file-based cache is for development:
+# its add and incr are not atomic, so feed page builds are not single-flight
+# across workers (see posts.cache.cache_is_atomic).
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
-    }
+        "BACKEND": "posts.cache_backends.TwoTierCache",
+        "OPTIONS": {
+            "SHARED": "shared",
+            "LOCAL_MAX_ENTRIES": 2000,
+            "LOCAL_TIMEOUT": 5,
+            "SYNC_INTERVAL": 0.5,
+        },
+    },
+    "shared": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["CONNECTLY_REDIS_URL"],
+        }
+        if os.environ.get("CONNECTLY_REDIS_URL")
+        else {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("CONNECTLY_CACHE_DIR", BASE_DIR / ".cache"),
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    ),
+}
+
+# The test runner swaps CACHES for in-memory caches (posts.runner.TEST_CACHES).
+TEST_RUNNER = "posts.runner.ConnectlyTestRunner"
+
+# Newest comments embedded in each feed item; the rest load through the
+# post's comments endpoint with the item's comments_next cursor link.
+FEED_COMMENT_PREVIEW = 3
+
+# Fan-out-on-write timelines used by the news feed. The feed only serves pages
+# from a shared backend: point BACKEND at posts.timeline.RedisTimelineBackend
+# (with OPTIONS {"url": ...}) to enable that; the per-process default misses
+# posts made by other workers, so the feed queries the database instead.
+TIMELINE = {
+    "BACKEND": "posts.timeline.InMemoryTimelineBackend",
+    "MAX_LENGTH": 1000,
 }
 
+# Full-text post search. On databases other than SQLite, use
+# posts.search.DatabaseSearchBackend or a backend for that database.
+SEARCH = {
+    "BACKEND": "posts.search.SQLiteFTSBackend",
+    "OPTIONS": {"title_weight": 4.0, "content_weight": 1.0},
+}
 
+# Like/unlike ingestion. "direct" writes each tap in its own transaction;
+# "buffered" coalesces taps per (user, post) in posts.likebuffer.LikeBuffer and
+# writes them in one transaction every FLUSH_INTERVAL seconds or MAX_BATCH keys.
+LIKE_INGESTION = {
+    "MODE": "direct",
+    "MAX_BATCH": 500,
+    "FLUSH_INTERVAL": 1.0,
+}
+
+# Post settings live in the PostConfig row; each worker checks the version
+# published in the cache at most every REFRESH_INTERVAL seconds and reloads the
+# row when it changed, so an update reaches every worker within that interval.
+POST_CONFIG = {
+    "REFRESH_INTERVAL": 1.0,
+}
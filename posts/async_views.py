@@ -0,0 +1,201 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from .authentication import token_cache
+from .cache import FEED_CACHE_TIMEOUT, aget_feed_version, aget_or_build, aserialize_posts, feed_cache_key
+from .fieldsets import FieldSelection
+from .interactions import ingest_like, comment_on_post
+from .likebuffer import apply_pending_likes, has_pending_likes
+from .metrics import record_cache
+from .models import Post, Comment
+from .routers import replica_read_may_be_stale
+from .pagination import PostPagination
+from .serializers import CommentSerializer, FeedPostSerializer
+from .views import TaskPagination
+
+
+async def authenticate(request):
+    """Resolves an ``Authorization: Token <key>`` header from the token cache or the async ORM.
+
+    The user is also set on the request, as DRF does, for the replica router and its pinning.
+    """
+    header = request.headers.get("Authorization", "").split()
+    if len(header) != 2 or header[0].lower() != "token":
+        return None
+    token = await token_cache.aget(header[1])
+    if token is None:
+        loaded_at = time.time()
+        token = await Token.objects.select_related("user__profile").filter(key=header[1]).afirst()
+        if token is None or not token.user.is_active:
+            return None
+        token_cache.set(token, loaded_at)
+    if not token.user.is_active:
+        return None
+    request.user = token.user
+    return token.user
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """Base for async JSON endpoints authenticated with DRF tokens.
+
+    Handlers authenticate alongside lookups that do not depend on the user with
+    ``asyncio.gather``, otherwise first, and call ``unauthorized()`` or
+    ``not_found()`` on the results.
+    """
+    pagination_class = PostPagination
+
+    @staticmethod
+    def unauthorized():
+        return json_response({"detail": "Invalid or missing token."}, status=401)
+
+    @staticmethod
+    def not_found(detail="Not found."):
+        return json_response({"detail": detail}, status=404)
+
+    @staticmethod
+    def bad_request(errors):
+        return json_response(errors, status=400)
+
+    def get_page_size(self, request):
+        paginator = self.pagination_class
+        try:
+            size = int(request.GET.get(paginator.page_size_query_param, paginator.page_size))
+        except ValueError:
+            size = paginator.page_size
+        return min(max(size, 1), paginator.max_page_size)
+
+    def get_position(self, request):
+        """Decodes ``?cursor=``; raises NotFound for a malformed cursor."""
+        return self.pagination_class().decode_cursor(request.GET.get("cursor", ""))
+
+    def next_link(self, request, position):
+        if position is None:
+            return None
+        cursor = self.pagination_class().encode_cursor(*position)
+        return replace_query_param(request.build_absolute_uri(), "cursor", cursor)
+
+    async def keyset_page(self, request, queryset, position):
+        page_size = self.get_page_size(request)
+        queryset = self.pagination_class.seek(queryset, position)[:page_size + 1]
+        rows = [row async for row in queryset]
+        return self.pagination_class.split_page(rows, page_size)
+
+    @staticmethod
+    async def visible_post(user, post_id):
+        """The post if ``user`` may see it, else None, in one query."""
+        return await Post.objects.visible_to(user).filter(pk=post_id).afirst()
+
+    @staticmethod
+    def parse_body(request):
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError:
+                return {}
+        return request.POST
+
+
+# ✅ Async News Feed (cursor pages)
+class AsyncNewsFeedView(AsyncAPIView):
+    pagination_class = TaskPagination
+
+    async def get(self, request):
+        """Posts visible to the user, newest first, cached per feed version like NewsFeedView."""
+        try:
+            position = self.get_position(request)
+            selection = FieldSelection.from_request(request, FeedPostSerializer)
+        except NotFound as exc:
+            return self.not_found(str(exc.detail))
+        except ValidationError as exc:
+            return self.bad_request(exc.detail)
+        user, version = await asyncio.gather(authenticate(request), aget_feed_version())
+        if user is None:
+            return self.unauthorized()
+
+        page_size = self.get_page_size(request)
+        cache_key = feed_cache_key(
+            user, f"c{request.GET.get('cursor', '')}", page_size, version=version, variant=selection.key
+        )
+
+        async def build():
+            queryset = (
+                Post.objects.visible_to(user).select_related("author__profile").order_by("-created_at", "-id")
+            )
+            queryset = selection.restrict(queryset, FeedPostSerializer)
+            posts, next_position = await self.keyset_page(request, queryset, position)
+            results = await aserialize_posts(posts, FeedPostSerializer, {"request": request}, selection)
+            data = {"next": self.next_link(request, next_position), "results": apply_pending_likes(results, user)}
+            return data, not replica_read_may_be_stale()
+
+        if has_pending_likes(user):
+            record_cache(misses=1)
+            data, _ = await build()
+        else:
+            data = await aget_or_build(cache_key, build, FEED_CACHE_TIMEOUT)
+        return json_response(data)
+
+
+# ✅ Async Like
+class AsyncLikePostView(AsyncAPIView):
+    async def post(self, request, post_id):
+        user = await authenticate(request)
+        if user is None:
+            return self.unauthorized()
+        post = await self.visible_post(user, post_id)
+        if post is None:
+            return self.not_found()
+        # The write paths are synchronous (transactions, the like buffer's lock).
+        await sync_to_async(ingest_like)(user, post)
+        return json_response({"message": "Post liked!"})
+
+
+# ✅ Async Comment
+class AsyncCommentPostView(AsyncAPIView):
+    async def post(self, request, post_id):
+        comment_text = self.parse_body(request).get("comment")
+        user = await authenticate(request)
+        if user is None:
+            return self.unauthorized()
+        post = await self.visible_post(user, post_id)
+        if post is None:
+            return self.not_found()
+        if not comment_text:
+            return json_response({"error": "Comment cannot be empty."}, status=400)
+        await sync_to_async(comment_on_post)(user, post, comment_text)
+        return json_response({"message": "Comment added!"})
+
+
+# ✅ Async Post Comments (cursor pages)
+class AsyncPostCommentsView(AsyncAPIView):
+    async def get(self, request, post_id):
+        try:
+            position = self.get_position(request)
+        except NotFound as exc:
+            return self.not_found(str(exc.detail))
+        user = await authenticate(request)
+        if user is None:
+            return self.unauthorized()
+        queryset = (
+            Comment.objects.filter(post_id=post_id, post__in=Post.objects.visible_to(user).filter(pk=post_id))
+            .select_related("user__profile")
+            .order_by("-created_at", "-id")
+        )
+        comments, next_position = await self.keyset_page(request, queryset, position)
+        results = CommentSerializer(comments, many=True, context={"request": request}).data
+        return json_response({"next": self.next_link(request, next_position), "results": results})
@@ -0,0 +1,144 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def revocation_key(user_id):
+    return f"auth:revoked:{user_id}"
+
+
+class TokenCache:
+    """Thread-safe LRU of token key -> Token (with user and profile loaded) with a TTL.
+
+    Logout, token rotation and user/profile changes record a revocation time for
+    the user in the shared cache (``cache_alias``); a hit on an entry loaded
+    before that time is dropped, so every worker stops accepting a revoked token
+    on its next request rather than after the TTL. Hits return copies of the
+    cached token and user, so concurrent requests never share one instance.
+    """
+
+    def __init__(self, max_size=10_000, ttl=60, cache_alias="default"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def get(self, key):
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        token, loaded_at = entry
+        return self._validate(key, token, loaded_at, self.shared.get(revocation_key(token.user_id)))
+
+    async def aget(self, key):
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        token, loaded_at = entry
+        return self._validate(key, token, loaded_at, await self.shared.aget(revocation_key(token.user_id)))
+
+    def set(self, token, loaded_at):
+        """Caches a token read from the database; ``loaded_at`` is time.time() from before the read."""
+        token = _detached(token)
+        with self._lock:
+            self._pop(token.key)
+            self._entries[token.key] = (token, time.monotonic() + self.ttl, loaded_at)
+            self._keys_by_user.setdefault(token.user_id, set()).add(token.key)
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def revoke_user(self, user_id):
+        """Makes every worker reload the user's tokens; call once the change has committed."""
+        self.shared.set(revocation_key(user_id), time.time(), timeout=self.ttl)
+        self.discard_user(user_id)
+
+    def discard(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at, loaded_at = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return token, loaded_at
+
+    def _validate(self, key, token, loaded_at, revoked_at):
+        if revoked_at is not None and revoked_at >= loaded_at:
+            self.discard(key)
+            return None
+        return _detached(token)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user.get(entry[0].user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[entry[0].user_id]
+
+
+def _detached(token):
+    """A copy of ``token`` with its own user and profile instances."""
+    user = copy.copy(token.user)
+    profile = getattr(token.user, "profile", None)
+    if profile is not None:
+        user.profile = copy.copy(profile)
+    token = copy.copy(token)
+    token.user = user
+    return token
+
+
+_config = getattr(settings, "AUTH_TOKEN_CACHE", {})
+token_cache = TokenCache(
+    max_size=_config.get("MAX_SIZE", 10_000), ttl=_config.get("TTL", 60),
+    cache_alias=_config.get("CACHE_ALIAS", "default"),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that serves repeat requests from ``token_cache`` without a query."""
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            loaded_at = time.time()
+            try:
+                token = Token.objects.select_related("user__profile").get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed("Invalid token.")
+            if token.user.is_active:
+                token_cache.set(token, loaded_at)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted.")
+        return (token.user, token)
@@ -0,0 +1,277 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+from .metrics import record_cache
+
+FEED_VERSION_KEY = "feed:version"
+FEED_CHANGED_AT_KEY = "feed:changed_at"
+FEED_CACHE_TIMEOUT = 300  # 5 minutes
+POST_FRAGMENT_TIMEOUT = 600
+POST_FRAGMENT_PREFIX = "post_fragment"
+# Every serializer shape cached per post; see FeedPostSerializer.fragment_prefix.
+FRAGMENT_PREFIXES = (POST_FRAGMENT_PREFIX, "feed_post_fragment")
+BUILD_LEASE_SECONDS = 10
+BUILD_POLL_SECONDS = 0.05
+
+
+def cache_is_atomic():
+    """False when the shared cache is file-based, whose add and incr race across processes."""
+    default = caches["default"]
+    return getattr(default, "atomic", not isinstance(default, FileBasedCache))
+
+
+def _new_feed_version():
+    """Seeds a version from the clock so an evicted counter never reuses old keys."""
+    return time.time_ns() // 1000
+
+
+def get_feed_version():
+    """Returns the current feed generation, initialising it if missing."""
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, _new_feed_version(), timeout=None)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+async def aget_feed_version():
+    version = await cache.aget(FEED_VERSION_KEY)
+    if version is None:
+        await cache.aadd(FEED_VERSION_KEY, _new_feed_version(), timeout=None)
+        version = await cache.aget(FEED_VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    """Invalidates every cached feed page in O(1) by moving to a new generation.
+
+    Two racing non-atomic increments could both land on the same version, so
+    without an atomic cache each bump takes a fresh clock-based version instead.
+    """
+    cache.set(FEED_CHANGED_AT_KEY, time.time(), timeout=None)
+    if cache_is_atomic():
+        try:
+            return cache.incr(FEED_VERSION_KEY)
+        except ValueError:
+            pass
+    version = _new_feed_version()
+    cache.set(FEED_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def feed_changed_at():
+    """Epoch seconds of the last feed generation change, or None if unknown."""
+    return cache.get(FEED_CHANGED_AT_KEY)
+
+
+def feed_changed_within(seconds):
+    """True if the feed moved to a new generation less than ``seconds`` ago."""
+    changed_at = feed_changed_at()
+    return changed_at is not None and time.time() - changed_at < seconds
+
+
+def feed_cache_key(user, page, page_size, version=None, variant=""):
+    """Builds a feed page key that covers the generation, viewer, page, page size and field selection."""
+    viewer = user.pk if user.is_authenticated else "anon"
+    if version is None:
+        version = get_feed_version()
+    key = f"feed:v{version}:u{viewer}:p{page}:s{page_size}"
+    return f"{key}:{variant}" if variant else key
+
+
+class _KeyLocks:
+    """Reference-counted per-key locks, dropped once nobody holds or waits on them."""
+
+    def __init__(self, lock_factory):
+        self._lock_factory = lock_factory
+        self._guard = threading.Lock()
+        self._locks = {}
+
+    def acquire_entry(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [self._lock_factory(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def release_entry(self, key):
+        with self._guard:
+            entry = self._locks[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    @contextmanager
+    def hold(self, key):
+        lock = self.acquire_entry(key)
+        try:
+            with lock:
+                yield
+        finally:
+            self.release_entry(key)
+
+    @asynccontextmanager
+    async def ahold(self, key):
+        lock = self.acquire_entry(key)
+        try:
+            async with lock:
+                yield
+        finally:
+            self.release_entry(key)
+
+
+_build_locks = _KeyLocks(threading.Lock)
+_abuild_locks = _KeyLocks(asyncio.Lock)
+
+
+def lease_key(key):
+    return f"lease:{key}"
+
+
+def get_or_build(key, build, timeout):
+    """Returns the cached value for ``key``, building it at most once per miss.
+
+    ``build`` returns ``(value, cacheable)``. Concurrent misses on the same key
+    collapse: threads of this process queue on a per-key lock, and other processes
+    wait for the builder's lease in the shared cache (polling for the value) instead
+    of all recomputing it. A builder that dies releases nothing, so waiters give up
+    after BUILD_LEASE_SECONDS and build themselves. A file-based cache cannot grant
+    leases atomically, so there builds are single-flight within a process only.
+    """
+    value = cache.get(key)
+    if value is not None:
+        record_cache(hits=1)
+        return value
+
+    with _build_locks.hold(key):
+        value = cache.get(key)
+        leased = cache_is_atomic()
+        deadline = time.monotonic() + BUILD_LEASE_SECONDS
+        while value is None and leased and not cache.add(lease_key(key), True, timeout=BUILD_LEASE_SECONDS):
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(BUILD_POLL_SECONDS)
+            value = cache.get(key)
+        if value is not None:
+            record_cache(hits=1)
+            return value
+
+        record_cache(misses=1)
+        try:
+            value, cacheable = build()
+            if cacheable:
+                cache.set(key, value, timeout=timeout)
+        finally:
+            if leased:
+                cache.delete(lease_key(key))
+        return value
+
+
+async def aget_or_build(key, build, timeout):
+    """Async counterpart of get_or_build; ``build`` is a coroutine function."""
+    value = await cache.aget(key)
+    if value is not None:
+        record_cache(hits=1)
+        return value
+
+    async with _abuild_locks.ahold(key):
+        value = await cache.aget(key)
+        leased = cache_is_atomic()
+        deadline = time.monotonic() + BUILD_LEASE_SECONDS
+        while value is None and leased and not await cache.aadd(lease_key(key), True, timeout=BUILD_LEASE_SECONDS):
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(BUILD_POLL_SECONDS)
+            value = await cache.aget(key)
+        if value is not None:
+            record_cache(hits=1)
+            return value
+
+        record_cache(misses=1)
+        try:
+            value, cacheable = await build()
+            if cacheable:
+                await cache.aset(key, value, timeout=timeout)
+        finally:
+            if leased:
+                await cache.adelete(lease_key(key))
+        return value
+
+
+def post_fragment_key(post, prefix=POST_FRAGMENT_PREFIX):
+    """Keys a serialized post by id and updated_at.
+
+    The counters are part of the key because their F() updates do not touch updated_at;
+    comments_count also retires feed fragments whose comment preview gained a comment.
+    """
+    stamp = int(post.updated_at.timestamp() * 1_000_000)
+    return f"{prefix}:{post.pk}:{stamp}:{post.likes_count}:{post.comments_count}"
+
+
+def fragment_prefix(serializer_class, selection=None):
+    """Fragments of a sparse field selection get their own keys.
+
+    Those keys are not in FRAGMENT_PREFIXES, so invalidate_post_fragment leaves them
+    alone; they still retire when updated_at or a counter changes.
+    """
+    prefix = getattr(serializer_class, "fragment_prefix", POST_FRAGMENT_PREFIX)
+    if selection is not None and selection.key:
+        prefix = f"{prefix}[{selection.key}]"
+    return prefix
+
+
+def serializer_options(selection):
+    return selection.serializer_kwargs() if selection is not None else {}
+
+
+def serialize_posts(posts, serializer_class, context, selection=None):
+    """Assembles serialized posts from cached fragments with one get_many, rebuilding only misses."""
+    prefix = fragment_prefix(serializer_class, selection)
+    keys = [post_fragment_key(post, prefix) for post in posts]
+    fragments = cache.get_many(keys)
+
+    missing = [post for post, key in zip(posts, keys) if key not in fragments]
+    record_cache(hits=len(fragments), misses=len(missing))
+    if missing:
+        data = serializer_class(missing, many=True, context=context, **serializer_options(selection)).data
+        fresh = {post_fragment_key(post, prefix): item for post, item in zip(missing, data)}
+        cache.set_many(fresh, timeout=POST_FRAGMENT_TIMEOUT)
+        fragments.update(fresh)
+
+    return [fragments[key] for key in keys]
+
+
+async def aserialize_posts(posts, serializer_class, context, selection=None):
+    """Async counterpart of serialize_posts using the cache's async API.
+
+    Misses are serialized in a worker thread because serializers may query the
+    database (FeedPostSerializer loads comment previews).
+    """
+    prefix = fragment_prefix(serializer_class, selection)
+    keys = [post_fragment_key(post, prefix) for post in posts]
+    fragments = await cache.aget_many(keys)
+
+    missing = [post for post, key in zip(posts, keys) if key not in fragments]
+    record_cache(hits=len(fragments), misses=len(missing))
+    if missing:
+        options = serializer_options(selection)
+        data = await sync_to_async(lambda: serializer_class(missing, many=True, context=context, **options).data)()
+        fresh = {post_fragment_key(post, prefix): item for post, item in zip(missing, data)}
+        await cache.aset_many(fresh, timeout=POST_FRAGMENT_TIMEOUT)
+        fragments.update(fresh)
+
+    return [fragments[key] for key in keys]
+
+
+def invalidate_post_fragment(post):
+    """Drops the fragments for the post as loaded, before a write makes them stale."""
+    invalidate_post_fragments([post])
+
+
+def invalidate_post_fragments(posts):
+    cache.delete_many([post_fragment_key(post, prefix) for post in posts for prefix in FRAGMENT_PREFIXES])
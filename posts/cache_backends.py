@@ -0,0 +1,231 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.utils.functional import cached_property
+
+_MISSING = object()
+GENERATION_KEY = "twotier:generation"
+CLEAR_ALL = "*"
+
+
+def invalidation_key(generation):
+    return f"twotier:invalidated:{generation}"
+
+
+class TwoTierCache(BaseCache):
+    """A per-process LRU in front of a shared cache (file-based, Redis, ...).
+
+    Reads are served from the local tier when possible and fall back to the shared
+    tier; writes go to both. Every write or delete is also appended to an
+    invalidation log in the shared tier: a generation counter plus one entry per
+    generation listing the changed keys. Each process polls the counter at most
+    every SYNC_INTERVAL seconds and drops the listed keys from its LRU, or its whole
+    LRU if it fell too far behind. Local entries also expire after LOCAL_TIMEOUT, so
+    a missed broadcast (for example a racing, non-atomic ``incr`` on the file
+    backend) is bounded in time.
+
+    Production needs a shared tier with atomic ``add`` and ``incr`` such as Redis.
+    With the file-based tier ``atomic`` is False, and posts.cache falls back to
+    clock-based feed versions and skips its cross-process build leases.
+
+    OPTIONS:
+        SHARED: alias in CACHES of the shared tier (default "shared").
+        LOCAL_MAX_ENTRIES: LRU size (default 1000).
+        LOCAL_TIMEOUT: seconds a local copy may be served (default 5).
+        SYNC_INTERVAL: seconds between invalidation-log polls (default 0.5).
+        LOG_SIZE: generations kept in the log (default 1000).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = options.get("SHARED", "shared")
+        self.local_max_entries = options.get("LOCAL_MAX_ENTRIES", 1000)
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self.sync_interval = options.get("SYNC_INTERVAL", 0.5)
+        self.log_size = options.get("LOG_SIZE", 1000)
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._own_generations = set()
+        self._seen_generation = None
+        self._next_sync = 0.0
+
+    @cached_property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    @property
+    def atomic(self):
+        """Whether ``add`` and ``incr`` are atomic across processes."""
+        return not isinstance(self.shared, FileBasedCache)
+
+    # Local tier
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+            pickled, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            self._local_discard([key])
+            return
+        ttl = self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (pickled, time.monotonic() + ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def local_clear(self):
+        with self._lock:
+            self._local.clear()
+
+    # Invalidation log
+
+    def _broadcast(self, keys):
+        try:
+            generation = self.shared.incr(GENERATION_KEY)
+        except ValueError:
+            self.shared.add(GENERATION_KEY, 0, timeout=None)
+            generation = self.shared.incr(GENERATION_KEY)
+        self.shared.set(invalidation_key(generation), list(keys), timeout=None)
+        self.shared.delete(invalidation_key(generation - self.log_size))
+        with self._lock:
+            self._own_generations.add(generation)
+
+    def sync(self, force=False):
+        """Applies invalidations broadcast by other processes since the last poll."""
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+        generation = self.shared.get(GENERATION_KEY, 0)
+        seen = self._seen_generation
+        self._seen_generation = generation
+        if seen is None or generation == seen:
+            return
+        if generation < seen or generation - seen > self.log_size:
+            self.local_clear()
+            return
+
+        wanted = [g for g in range(seen + 1, generation + 1) if g not in self._own_generations]
+        entries = self.shared.get_many([invalidation_key(g) for g in wanted])
+        with self._lock:
+            self._own_generations = {g for g in self._own_generations if g > generation}
+        if len(entries) < len(wanted) or any(CLEAR_ALL in keys for keys in entries.values()):
+            self.local_clear()
+            return
+        self._local_discard({key for keys in entries.values() for key in keys})
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        self.sync()
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self.sync()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._local_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.shared.get_many(missing, version=version)
+            for key, value in fetched.items():
+                self._local_set(self.make_and_validate_key(key, version=version), value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout=self._shared_timeout(timeout), version=version)
+        self._local_set(local_key, value, timeout)
+        self._broadcast([local_key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=self._shared_timeout(timeout), version=version)
+        local_keys = []
+        for key, value in data.items():
+            local_key = self.make_and_validate_key(key, version=version)
+            self._local_set(local_key, value, timeout)
+            local_keys.append(local_key)
+        if local_keys:
+            self._broadcast(local_keys)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Only the shared tier knows whether the key exists; nothing is cached locally,
+        # so leases and first-writer-wins keys stay exact.
+        self.make_and_validate_key(key, version=version)
+        return self.shared.add(key, value, timeout=self._shared_timeout(timeout), version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=self._shared_timeout(timeout), version=version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self.shared.incr(key, delta, version=version)
+        self._local_set(local_key, value)
+        self._broadcast([local_key])
+        return value
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        deleted = self.shared.delete(key, version=version)
+        self._local_discard([local_key])
+        self._broadcast([local_key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        local_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if not local_keys:
+            return
+        self.shared.delete_many(keys, version=version)
+        self._local_discard(local_keys)
+        self._broadcast(local_keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def clear(self):
+        self.shared.clear()
+        self.local_clear()
+        self._broadcast([CLEAR_ALL])
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def _shared_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
@@ -0,0 +1,105 @@
+from calendar import timegm
+
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def post_validators(post):
+    """ETag and Last-Modified of a post, from the columns its fragment cache key uses.
+
+    Like and comment counters change through F() updates that leave updated_at
+    alone, so they are part of the ETag; Last-Modified only reflects edits.
+    """
+    stamp = int(post.updated_at.timestamp() * 1_000_000)
+    etag = quote_etag(f"post-{post.pk}-{stamp}-{post.likes_count}-{post.comments_count}")
+    return etag, post.updated_at
+
+
+def check_preconditions(request, etag, last_modified):
+    """Returns a 304 or 412 response if the request's conditional headers call for one, else None."""
+    if etag is None and last_modified is None:
+        return None
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified is not None else None
+    response = get_conditional_response(getattr(request, "_request", request), etag, timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    if etag is not None:
+        response.headers.setdefault("ETag", etag)
+    if last_modified is not None:
+        response.headers.setdefault("Last-Modified", http_date(timegm(last_modified.utctimetuple())))
+    return response
+
+
+class ConditionalGetMixin:
+    """Answers If-None-Match and If-Modified-Since before the view builds its body.
+
+    ``get_validators(request)`` returns ``(etag, last_modified)`` computed from cheap
+    state (versions, timestamps, counters), or ``(None, None)`` when the response
+    cannot be validated; a match returns 304 without running the serializer.
+    """
+
+    def get_validators(self, request):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = check_preconditions(request, etag, last_modified)
+        if response is not None:
+            return response
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
+
+
+class ConditionalUpdateMixin(ConditionalGetMixin):
+    """Adds If-Match / If-Unmodified-Since on PUT, PATCH and DELETE to a detail view.
+
+    ``get_validators`` should read the object through ``get_object``, which is
+    memoized so the checked row is the one written.
+
+    The precondition is checked and the write made in one transaction, on a row
+    read with select_for_update (SQLite's IMMEDIATE transactions serialize writers
+    instead), so a concurrent writer cannot slip in between and be overwritten.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in ("PUT", "PATCH", "DELETE"):
+            queryset = queryset.select_for_update()
+        return queryset
+
+    def get_object(self):
+        if not hasattr(self, "_object"):
+            self._object = super().get_object()
+        return self._object
+
+    def conditional_write(self, request, write):
+        with transaction.atomic():
+            response = check_preconditions(request, *self.get_validators(request))
+            if response is not None:
+                return response
+            response = write()
+        if 200 <= response.status_code < 300 and request.method != "DELETE":
+            set_validators(response, *self.get_validators(request))
+        return response
+
+    def put(self, request, *args, **kwargs):
+        return self.conditional_write(
+            request, lambda: super(ConditionalUpdateMixin, self).put(request, *args, **kwargs)
+        )
+
+    def patch(self, request, *args, **kwargs):
+        return self.conditional_write(
+            request, lambda: super(ConditionalUpdateMixin, self).patch(request, *args, **kwargs)
+        )
+
+    def delete(self, request, *args, **kwargs):
+        return self.conditional_write(
+            request, lambda: super(ConditionalUpdateMixin, self).delete(request, *args, **kwargs)
+        )
@@ -0,0 +1,19 @@
+from django.conf import settings
+
+
+def sqlite_pragmas():
+    """The PRAGMA settings of the active ``settings.SQLITE_PROFILE``."""
+    profiles = getattr(settings, "SQLITE_PROFILES", {})
+    return profiles.get(getattr(settings, "SQLITE_PROFILE", None), {}).get("PRAGMAS", {})
+
+
+def configure_sqlite_connection(connection):
+    """Applies the profile's pragmas to a freshly opened SQLite connection.
+
+    In-memory test databases ignore journal_mode=WAL and mmap_size, which is harmless.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name} = {value}")
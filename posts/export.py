@@ -0,0 +1,117 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from .models import Post, Comment
+
+DEFAULT_CHUNK_SIZE = 500
+# Comments are read with their post's chunk up to this many per post; the rest
+# of a post's comments follow in keyset pages of the same size.
+COMMENT_PAGE_SIZE = 100
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """Keeps full microsecond precision so exported timestamps work as watermarks."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def export_queryset(since=None):
+    """Posts with authors and the time their comments last changed, oldest change first.
+
+    With ``since``, only posts edited, commented on or with a comment edited after
+    the watermark are included. Like counts are exported as they are but do not
+    advance a post.
+    """
+    newest_comment = Comment.objects.filter(post=OuterRef("pk")).order_by("-updated_at")
+    queryset = (
+        Post.objects.select_related("author")
+        .annotate(last_commented_at=Subquery(newest_comment.values("updated_at")[:1]))
+        .order_by("updated_at", "id")
+    )
+    if since is not None:
+        changed_comments = Comment.objects.filter(post=OuterRef("pk"), updated_at__gt=since)
+        queryset = queryset.filter(Q(updated_at__gt=since) | Exists(changed_comments))
+    return queryset
+
+
+def post_record(post):
+    """A post's fields; its comments are streamed separately (see iter_records)."""
+    changed_at = max(filter(None, [post.updated_at, post.last_commented_at]))
+    return {
+        "id": post.pk,
+        "title": post.title,
+        "content": post.content,
+        "privacy": post.privacy,
+        "created_at": post.created_at,
+        "updated_at": post.updated_at,
+        "changed_at": changed_at,
+        "author": {"id": post.author_id, "username": post.author.username},
+        "likes_count": post.likes_count,
+        "comments_count": post.comments_count,
+    }
+
+
+def comment_record(comment):
+    return {
+        "id": comment.pk,
+        "user": {"id": comment.user_id, "username": comment.user.username},
+        "content": comment.content,
+        "created_at": comment.created_at,
+    }
+
+
+def iter_comments(post_id, page):
+    """Yields a post's comment records oldest first, starting from its first ``page``."""
+    while True:
+        for comment in page:
+            yield comment_record(comment)
+        if len(page) < COMMENT_PAGE_SIZE:
+            return
+        last = page[-1]
+        page = list(
+            Comment.objects.select_related("user")
+            .filter(post_id=post_id)
+            .filter(Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.pk))
+            .order_by("created_at", "id")[:COMMENT_PAGE_SIZE]
+        )
+
+
+def iter_records(since=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields ``(record, comments)`` per post, ``comments`` being an iterator of comment records.
+
+    At most one chunk of posts and ``COMMENT_PAGE_SIZE`` comments per post are in
+    memory, however many comments a post has. Consume ``comments`` before the next
+    item. The largest ``changed_at`` seen is the watermark to pass as ``since`` next time.
+    """
+    posts = export_queryset(since).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(posts, chunk_size)):
+        commented = [post.pk for post in chunk if post.last_commented_at is not None]
+        first_pages = defaultdict(list)
+        if commented:
+            comments = Comment.objects.filter(post_id__in=commented).select_related("user")
+            for comment in comments.oldest_per_post(COMMENT_PAGE_SIZE):
+                first_pages[comment.post_id].append(comment)
+        for post in chunk:
+            yield post_record(post), iter_comments(post.pk, first_pages.pop(post.pk, []))
+
+
+def iter_ndjson_line(record, comments):
+    """Yields one post's NDJSON line in pieces, a comment at a time."""
+    head = json.dumps(record, cls=ExportJSONEncoder)
+    yield head[:-1] + ', "comments": ['
+    for index, comment in enumerate(comments):
+        yield ("," if index else "") + json.dumps(comment, cls=ExportJSONEncoder)
+    yield "]}\n"
+
+
+def iter_ndjson(since=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    for record, comments in iter_records(since, chunk_size):
+        yield from iter_ndjson_line(record, comments)
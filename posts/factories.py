@@ -1,8 +1,57 @@
-from .models import Post
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from .models import Post, UserProfile
+from .singleton import PostConfigManager
+
+
+class PostQuotaExceeded(Exception):
+    """The author already has max_posts_per_user posts."""
+
 
 class PostFactory:
     @staticmethod
-    def create_post(author, title, content):
-        return Post.objects.create(author=author, title=title, content=content)
+    def create_post(author, title, content, privacy="public"):
+        """Creates a post, enforcing the max_posts_per_user setting.
+
+        A slot is reserved with one conditional UPDATE of the author's
+        ``posts_count``, so concurrent creates cannot overshoot the limit and no
+        COUNT runs; the reservation rolls back with the insert if it fails.
+        """
+        limit = PostConfigManager().get("max_posts_per_user")
+        with transaction.atomic():
+            if not PostFactory.reserve_post_slot(author, limit):
+                raise PostQuotaExceeded(f"You have reached the limit of {limit} posts.")
+            return Post.objects.create(author=author, title=title, content=content, privacy=privacy)
 
+    @staticmethod
+    def reserve_post_slot(author, limit):
+        reserved = UserProfile.objects.filter(user=author, posts_count__lt=limit).update(
+            posts_count=F("posts_count") + 1
+        )
+        if reserved or UserProfile.objects.filter(user=author).exists():
+            return bool(reserved)
+        # Users created before profiles were provisioned on registration.
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=author, posts_count=Post.objects.filter(author=author).count())],
+            ignore_conflicts=True,
+        )
+        return PostFactory.reserve_post_slot(author, limit)
+
+
+class UserFactory:
+    @staticmethod
+    def bulk_create_users(users, batch_size=1000):
+        """Inserts users and their profiles in bulk, without per-row post_save signals."""
+        User = get_user_model()
+        with transaction.atomic():
+            created = User.objects.bulk_create(users, batch_size=batch_size)
+            if any(user.pk is None for user in created):
+                # Backends that cannot return primary keys from bulk inserts.
+                created = list(User.objects.filter(username__in=[user.username for user in users]))
+            UserProfile.objects.bulk_create(
+                [UserProfile(user=user) for user in created], batch_size=batch_size, ignore_conflicts=True
+            )
+        return created
 
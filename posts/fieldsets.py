@@ -0,0 +1,238 @@
+from functools import cache
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+from .metrics import serializer_timer
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+# Raw attribute values of these fields already are their JSON representation.
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.IntegerField, serializers.ReadOnlyField,
+)
+_SKIP = object()
+
+
+def split_param(value):
+    return tuple(sorted({name.strip() for name in value.split(",") if name.strip()}))
+
+
+@cache
+def available_fields(serializer_class):
+    return tuple(serializer_class().fields)
+
+
+class FieldSelection:
+    """Which fields of a resource to render (``?fields=``) and which relations to nest (``?expand=``).
+
+    ``None`` means the serializer's default: every field, and every relation in
+    ``expandable_fields`` nested. A relation that is not expanded renders as its
+    primary key. ``id`` is always rendered.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request, serializer_class):
+        """Parses and validates the query parameters; only reads (GET, HEAD) are narrowed."""
+        if request.method not in ("GET", "HEAD"):
+            return cls()
+        params = request.query_params if hasattr(request, "query_params") else request.GET
+        fields = expand = None
+        if FIELDS_PARAM in params:
+            fields = split_param(params[FIELDS_PARAM])
+            unknown = set(fields) - set(available_fields(serializer_class))
+            if unknown:
+                raise serializers.ValidationError({FIELDS_PARAM: f"Unknown field(s): {', '.join(sorted(unknown))}."})
+            fields = tuple(sorted({"id", *fields}))
+        if EXPAND_PARAM in params:
+            expand = split_param(params[EXPAND_PARAM])
+            unknown = set(expand) - set(serializer_class.expandable_fields)
+            if unknown:
+                raise serializers.ValidationError({EXPAND_PARAM: f"Cannot expand: {', '.join(sorted(unknown))}."})
+        return cls(fields, expand)
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.expand is None
+
+    @property
+    def key(self):
+        """A cache-key fragment that is empty for the default selection."""
+        if self.is_default:
+            return ""
+        fields = ",".join(self.fields) if self.fields is not None else "*"
+        expand = ",".join(self.expand) if self.expand is not None else "*"
+        return f"f={fields};e={expand}"
+
+    def serializer_kwargs(self):
+        return {"fields": self.fields, "expand": self.expand}
+
+    def restrict(self, queryset, serializer_class):
+        """Loads only the columns and joins the selected fields need.
+
+        Columns in the serializer's ``always_load`` stay loaded for pagination and
+        fragment cache keys.
+        """
+        if self.is_default:
+            return queryset
+        serializer = serializer_class(**self.serializer_kwargs())
+        columns = set(serializer_class.always_load)
+        related = set()
+        for field in serializer.fields.values():
+            if field.source == "*":
+                continue
+            path = list(field.source_attrs)
+            if isinstance(field, serializers.BaseSerializer):
+                related.add("__".join(path))
+                for subfield in field.fields.values():
+                    subpath = path + subfield.source_attrs
+                    columns.add("__".join(subpath))
+                    if len(subpath) > len(path) + 1:
+                        related.add("__".join(subpath[:-1]))
+            else:
+                columns.add("__".join(path))
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+class SparseFieldsMixin:
+    """Accepts ``fields`` and ``expand`` keyword arguments (see FieldSelection).
+
+    Subclasses list their nested relations in ``expandable_fields`` and the columns
+    every read needs in ``always_load``.
+    """
+    expandable_fields = ()
+    always_load = ("id",)
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if expand is not None:
+            for name in set(self.expandable_fields) - set(expand):
+                if name in self.fields:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+
+def attribute_getter(source_attrs):
+    def get(instance):
+        for attr in source_attrs:
+            try:
+                instance = getattr(instance, attr)
+            except (AttributeError, ObjectDoesNotExist):
+                return _SKIP
+            if instance is None:
+                return None
+        return instance
+    return get
+
+
+def compile_plan(serializer):
+    """Turns a bound serializer into (name, getter) pairs that render one instance.
+
+    Decisions DRF makes per row and per field (field type, source lookup, None
+    handling) are made once here; plain values are read with getattr and only
+    fields that need conversion call their ``to_representation``.
+    """
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == "*":
+            plan.append((name, field.to_representation))
+            continue
+        get = attribute_getter(field.source_attrs)
+        if isinstance(field, serializers.ListSerializer):
+            plan.append((name, _fallback(field)))
+        elif isinstance(field, serializers.BaseSerializer):
+            plan.append((name, _nested(get, compile_plan(field))))
+        elif isinstance(field, serializers.PrimaryKeyRelatedField) and len(field.source_attrs) == 1:
+            plan.append((name, attribute_getter([f"{field.source}_id"])))
+        elif isinstance(field, PASSTHROUGH_FIELDS):
+            plan.append((name, get))
+        elif isinstance(field, serializers.DateTimeField):
+            plan.append((name, _datetime(get, field)))
+        elif isinstance(field, serializers.ChoiceField):
+            plan.append((name, _converted(get, field.to_representation)))
+        else:
+            plan.append((name, _fallback(field)))
+    return plan
+
+
+def _nested(get, plan):
+    def render(instance):
+        value = get(instance)
+        if value is None or value is _SKIP:
+            return value
+        return render_with(plan, value)
+    return render
+
+
+def _converted(get, to_representation):
+    def render(instance):
+        value = get(instance)
+        if value is None or value is _SKIP:
+            return value
+        return to_representation(value)
+    return render
+
+
+def _datetime(get, field):
+    """DateTimeField.to_representation with the timezone resolved once instead of per value."""
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    zone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or zone is None:
+        return _converted(get, field.to_representation)
+
+    def render(instance):
+        value = get(instance)
+        if value is None or value is _SKIP:
+            return value
+        if isinstance(value, str) or timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(zone).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    return render
+
+
+def _fallback(field):
+    def render(instance):
+        try:
+            value = field.get_attribute(instance)
+        except serializers.SkipField:
+            return _SKIP
+        check = value.pk if isinstance(value, PKOnlyObject) else value
+        return None if check is None else field.to_representation(value)
+    return render
+
+
+def render_with(plan, instance):
+    item = {}
+    for name, get in plan:
+        value = get(instance)
+        if value is not _SKIP:
+            item[name] = value
+    return item
+
+
+class LeanListSerializer(serializers.ListSerializer):
+    """Renders lists through a plan compiled once per list instead of DRF's per-row field walk.
+
+    The output is identical to the regular serializer's; only reads take this path.
+    """
+
+    def to_representation(self, data):
+        instances = data.all() if hasattr(data, "all") else data
+        with serializer_timer():
+            plan = compile_plan(self.child)
+            return [render_with(plan, instance) for instance in instances]
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .cache import invalidate_post_fragment
+from .likebuffer import get_like_buffer
+from .models import Post, Like, Comment
+
+
+def counter_delta_case(deltas, field="pk"):
+    """A CASE expression adding a per-row delta, keyed by ``field``, for one UPDATE over many rows."""
+    whens = [When(**{field: key}, then=Value(delta)) for key, delta in deltas.items()]
+    return Case(*whens, default=Value(0), output_field=IntegerField())
+
+
+def like_post(user, post):
+    """Records a like and bumps the post's counter; returns False if already liked."""
+    with transaction.atomic():
+        _, created = Like.objects.get_or_create(user=user, post=post)
+        if created:
+            Post.objects.filter(pk=post.pk).update(likes_count=F("likes_count") + 1)
+            invalidate_post_fragment(post)
+    return created
+
+
+def unlike_post(user, post):
+    """Removes a like and lowers the post's counter; returns False if it was not liked."""
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        if deleted:
+            Post.objects.filter(pk=post.pk).update(likes_count=F("likes_count") - 1)
+            invalidate_post_fragment(post)
+    return bool(deleted)
+
+
+def ingest_like(user, post, liked=True):
+    """Likes or unlikes through the write-behind buffer when LIKE_INGESTION is buffered.
+
+    In direct mode this is like_post/unlike_post. In buffered mode the event is
+    queued for the next flush and the return value is always True.
+    """
+    buffer = get_like_buffer()
+    if buffer is None:
+        return like_post(user, post) if liked else unlike_post(user, post)
+    buffer.record(user.pk, post.pk, liked)
+    return True
+
+
+def comment_on_post(user, post, content):
+    with transaction.atomic():
+        comment = Comment.objects.create(user=user, post=post, content=content)
+        Post.objects.filter(pk=post.pk).update(comments_count=F("comments_count") + 1)
+        invalidate_post_fragment(post)
+    return comment
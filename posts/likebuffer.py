@@ -0,0 +1,215 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """Write-behind buffer for like and unlike events.
+
+    Events are coalesced per (user_id, post_id), so only the last one counts, and
+    written in one transaction per flush. A flush happens every ``flush_interval``
+    seconds, as soon as ``max_batch`` keys are pending, and at interpreter exit.
+    A flush that fails puts its events back unless newer ones arrived meanwhile.
+
+    Each key remembers whether the like existed when it was first buffered, so
+    ``pending_deltas`` can adjust counters for the acting user before the flush.
+    With ``flush_interval=None`` no background thread runs and ``flush()`` must be
+    called explicitly (tests, management commands).
+    """
+
+    def __init__(self, max_batch=500, flush_interval=1.0):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._inflight = {}
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def record(self, user_id, post_id, liked):
+        key = (user_id, post_id)
+        with self._lock:
+            entry = self._pending.get(key) or self._inflight.get(key)
+        if entry is not None:
+            existed = entry[1]
+        else:
+            from .models import Like
+            existed = Like.objects.filter(user_id=user_id, post_id=post_id).exists()
+
+        with self._lock:
+            self._pending[key] = (liked, existed)
+            full = len(self._pending) >= self.max_batch
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def has_pending(self, user_id):
+        with self._lock:
+            return any(key[0] == user_id for key in self._pending.keys() | self._inflight.keys())
+
+    def pending_deltas(self, user_id, post_ids):
+        """Returns {post_id: -1 | 0 | 1}, the buffered change to each post's like count by this user."""
+        deltas = {}
+        with self._lock:
+            for post_id in post_ids:
+                key = (user_id, post_id)
+                entry = self._pending.get(key) or self._inflight.get(key)
+                if entry is not None:
+                    liked, existed = entry
+                    deltas[post_id] = int(liked) - int(existed)
+        return deltas
+
+    def flush(self):
+        """Writes every pending event in one transaction; returns the number of keys written."""
+        from .cache import bump_feed_version
+        from .interactions import counter_delta_case
+        from .models import Post, Like
+
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            try:
+                with transaction.atomic():
+                    user_ids = {user_id for user_id, _ in batch}
+                    post_ids = {post_id for _, post_id in batch}
+                    existing = {
+                        (user_id, post_id): pk
+                        for pk, user_id, post_id in Like.objects.filter(
+                            user_id__in=user_ids, post_id__in=post_ids
+                        ).values_list("pk", "user_id", "post_id")
+                    }
+                    live = set(Post.objects.filter(pk__in=post_ids).values_list("pk", flat=True))
+                    to_like = [key for key, (liked, _) in batch.items()
+                               if liked and key not in existing and key[1] in live]
+                    to_unlike = [existing[key] for key, (liked, _) in batch.items()
+                                 if not liked and key in existing]
+
+                    if to_like:
+                        Like.objects.bulk_create(
+                            [Like(user_id=user_id, post_id=post_id) for user_id, post_id in to_like],
+                            ignore_conflicts=True,
+                        )
+                    if to_unlike:
+                        Like.objects.filter(pk__in=to_unlike).delete()
+
+                    deltas = {}
+                    for _, post_id in to_like:
+                        deltas[post_id] = deltas.get(post_id, 0) + 1
+                    for key, (liked, _) in batch.items():
+                        if not liked and key in existing:
+                            deltas[key[1]] = deltas.get(key[1], 0) - 1
+                    deltas = {post_id: delta for post_id, delta in deltas.items() if delta}
+                    if deltas:
+                        Post.objects.filter(pk__in=deltas).update(
+                            likes_count=F("likes_count") + counter_delta_case(deltas)
+                        )
+            except Exception:
+                with self._lock:
+                    for key, entry in batch.items():
+                        self._pending.setdefault(key, entry)
+                    self._inflight = {}
+                raise
+
+            with self._lock:
+                self._inflight = {}
+        # Fragments are keyed on likes_count, so the counter update retires them.
+        if deltas:
+            transaction.on_commit(bump_feed_version)
+        return len(batch)
+
+    def start(self):
+        self._ensure_thread()
+
+    def shutdown(self):
+        """Stops the flusher thread and writes whatever is still buffered."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None or self.flush_interval is None or self._stopping:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="like-buffer-flusher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Like buffer flush failed; events kept for the next attempt")
+        finally:
+            connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_like_buffer():
+    """Returns the process-wide LikeBuffer, or None when ``settings.LIKE_INGESTION`` is direct."""
+    global _buffer
+    config = getattr(settings, "LIKE_INGESTION", {})
+    if config.get("MODE", "direct") != "buffered":
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = LikeBuffer(
+                    max_batch=config.get("MAX_BATCH", 500),
+                    flush_interval=config.get("FLUSH_INTERVAL", 1.0),
+                )
+                atexit.register(_buffer.shutdown)
+    return _buffer
+
+
+def reset_like_buffer():
+    """Shuts the process-wide buffer down, writing what it holds, and forgets it.
+
+    The buffer's atexit hook is removed too, so nothing flushes later against
+    whatever database is configured by then (tests reset it between cases).
+    """
+    global _buffer
+    with _buffer_lock:
+        buffer, _buffer = _buffer, None
+    if buffer is not None:
+        buffer.shutdown()
+        atexit.unregister(buffer.shutdown)
+
+
+def apply_pending_likes(items, user):
+    """Gives ``user`` read-your-writes on serialized posts by adding their buffered likes."""
+    buffer = get_like_buffer()
+    if buffer is None or user is None or not user.is_authenticated:
+        return items
+    deltas = buffer.pending_deltas(user.pk, [item["id"] for item in items])
+    if not deltas:
+        return items
+    return [
+        {**item, "likes_count": max(item["likes_count"] + deltas[item["id"]], 0)}
+        if deltas.get(item["id"]) and "likes_count" in item else item
+        for item in items
+    ]
+
+
+def has_pending_likes(user):
+    buffer = get_like_buffer()
+    return buffer is not None and user.is_authenticated and buffer.has_pending(user.pk)
@@ -0,0 +1,72 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.models import Post, Comment
+from posts.seeding import require_scratch_database, seed_users, seed_posts
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a large corpus and shows the query plans and timings of the feed, comment and "
+        "author queries. Point CONNECTLY_DB_PATH at a scratch database before running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000_000, help="Posts to have in the database.")
+        parser.add_argument("--users", type=int, default=1000, help="Users to seed when none exist.")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query.")
+        parser.add_argument("--page-size", type=int, default=10)
+
+    def handle(self, *args, **options):
+        require_scratch_database()
+        self.seed(options)
+
+        page_size = options["page_size"]
+        hot_post = Post.objects.order_by("-comments_count").only("pk").first()
+        author = Post.objects.values_list("author", flat=True).first()
+        public = Post.objects.filter(privacy="public")
+        middle = public.order_by("-created_at", "-id")[public.count() // 2]
+
+        queries = {
+            "feed first page": lambda: public.order_by("-created_at", "-id")[:page_size],
+            "feed keyset page (mid-table)": lambda: (
+                public.filter(created_at__lte=middle.created_at)
+                .filter(Q(created_at__lt=middle.created_at) | Q(id__lt=middle.pk))
+                .order_by("-created_at", "-id")[:page_size]
+            ),
+            "post comments (hottest post)": lambda: (
+                Comment.objects.filter(post=hot_post).order_by("-created_at", "-id")[:page_size]
+            ),
+            "author posts": lambda: Post.objects.filter(author=author).order_by("-created_at", "-id")[:page_size],
+        }
+
+        for name, build in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(build().explain())
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f"median {statistics.median(timings):.3f} ms, max {max(timings):.3f} ms\n")
+
+    def seed(self, options):
+        missing = options["posts"] - Post.objects.count()
+        if missing <= 0:
+            return
+        users = list(User.objects.all()[:options["users"]])
+        if not users:
+            users = seed_users(options["users"])
+
+        def progress(created):
+            self.stdout.write(f"  seeded {created['posts']}/{missing} posts", ending="\r")
+
+        self.stdout.write(f"Seeding {missing} posts...")
+        seed_posts(users, missing, progress=progress)
+        self.stdout.write("")
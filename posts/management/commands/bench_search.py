@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+from posts.management.commands.loadtest import percentile
+from posts.models import Post
+from posts.search import DatabaseSearchBackend, get_search_backend
+from posts.seeding import require_scratch_database, seed_users, seed_posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a post corpus and reports search latency percentiles for the configured backend "
+        "against the icontains fallback, for rare-term, common-term and deep-page queries. "
+        "Point CONNECTLY_DB_PATH at a scratch database before running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=200_000, help="Seed posts until at least this many exist.")
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--queries", type=int, default=200, help="Timed queries per case.")
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--skip-fallback", action="store_true", help="Do not time DatabaseSearchBackend.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        require_scratch_database()
+        users = seed_users(options["users"])
+        missing = options["posts"] - Post.objects.count()
+        if missing > 0:
+            self.stdout.write(f"Seeding {missing} posts...")
+            seed_posts(users, missing, seed=options["seed"])
+        total = Post.objects.count()
+        rng = random.Random(options["seed"])
+        # Seeded titles are "Seeded post <n>": a number is rare, "seeded" matches everything.
+        cases = {
+            "rare": [f"post {rng.randrange(total)}" for _ in range(options["queries"])],
+            "common": ["seeded"] * options["queries"],
+            "prefix": [f"content {rng.randrange(1, 100)}" for _ in range(options["queries"])],
+        }
+
+        backends = [("configured", get_search_backend())]
+        if not options["skip_fallback"] and not isinstance(get_search_backend(), DatabaseSearchBackend):
+            backends.append(("icontains", DatabaseSearchBackend()))
+
+        self.stdout.write(f"{total} posts, page size {options['page_size']}")
+        self.stdout.write(f"{'backend':<11} {'case':<8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for label, backend in backends:
+            for case, queries in cases.items():
+                latencies = sorted(self.time_query(backend, text, options["page_size"]) for text in queries)
+                self.stdout.write(
+                    f"{label:<11} {case:<8} {percentile(latencies, 50):>9.3f} "
+                    f"{percentile(latencies, 95):>9.3f} {percentile(latencies, 99):>9.3f}"
+                )
+            # Second page of a common term, which has to seek past the first page's rank.
+            first = backend.search("seeded", AnonymousUser(), None, options["page_size"])
+            if first:
+                last_pk, last_rank = first[-1]
+                latencies = sorted(
+                    self.time_query(backend, "seeded", options["page_size"], (last_rank, last_pk))
+                    for _ in range(options["queries"])
+                )
+                self.stdout.write(
+                    f"{label:<11} {'page 2':<8} {percentile(latencies, 50):>9.3f} "
+                    f"{percentile(latencies, 95):>9.3f} {percentile(latencies, 99):>9.3f}"
+                )
+
+    @staticmethod
+    def time_query(backend, text, limit, position=None):
+        began = time.perf_counter()
+        backend.search(text, AnonymousUser(), position, limit)
+        return (time.perf_counter() - began) * 1000
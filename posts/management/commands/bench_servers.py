@@ -0,0 +1,132 @@
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.management.commands.loadtest import percentile
+from posts.seeding import require_scratch_database, seed_users, seed_posts, seed_tokens
+from posts.models import Post
+
+# (label, uvicorn target, extra uvicorn flags, path driven under load)
+TARGETS = [
+    ("wsgi", "CONNECTLYPROJECT.wsgi:application", ["--interface", "wsgi"], "/api/feed/?cursor="),
+    ("asgi", "CONNECTLYPROJECT.asgi:application", ["--interface", "asgi3"], "/api/async/feed/?cursor="),
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves the project under uvicorn through the WSGI entry point (sync feed) and the ASGI "
+        "entry point (async feed), and compares throughput at a fixed number of concurrent connections. "
+        "Point CONNECTLY_DB_PATH at a scratch database before running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=64, help="Concurrent client connections.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per server.")
+        parser.add_argument("--posts", type=int, default=10_000)
+        parser.add_argument("--output", help="Write the JSON results to this path.")
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec("uvicorn") is None:
+            raise CommandError("bench_servers needs uvicorn: pip install uvicorn")
+        require_scratch_database()
+
+        users = seed_users(10)
+        token = next(iter(seed_tokens(users).values()))
+        missing = options["posts"] - Post.objects.count()
+        if missing > 0:
+            seed_posts(users, missing)
+
+        results = {}
+        for label, target, flags, path in TARGETS:
+            port = free_port()
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "CONNECTLYPROJECT.settings"))
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", target, *flags, "--port", str(port), "--log-level", "warning"],
+                cwd=settings.BASE_DIR, env=env,
+            )
+            try:
+                self.wait_until_ready(port)
+                results[label] = self.drive(f"http://127.0.0.1:{port}{path}", token, options)
+            finally:
+                server.terminate()
+                server.wait()
+            stats = results[label]
+            self.stdout.write(
+                f"{label}: {stats['throughput_rps']} req/s, p50 {stats['p50_ms']} ms, "
+                f"p99 {stats['p99_ms']} ms, {stats['errors']} errors"
+            )
+
+        if results["wsgi"]["throughput_rps"]:
+            gain = results["asgi"]["throughput_rps"] / results["wsgi"]["throughput_rps"]
+            self.stdout.write(self.style.SUCCESS(f"ASGI/WSGI throughput ratio: {gain:.2f}x"))
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                json.dump({"connections": options["connections"], "results": results}, handle, indent=2)
+
+    @staticmethod
+    def wait_until_ready(port, timeout=20):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise CommandError(f"Server on port {port} did not start within {timeout}s")
+
+    @staticmethod
+    def drive(url, token, options):
+        deadline = time.monotonic() + options["duration"]
+        lock = threading.Lock()
+        latencies = []
+        errors = [0]
+
+        def client():
+            request = urllib.request.Request(url, headers={"Authorization": f"Token {token}"})
+            while time.monotonic() < deadline:
+                began = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request, timeout=30) as response:
+                        response.read()
+                    ok = True
+                except (urllib.error.URLError, OSError):
+                    ok = False
+                elapsed = (time.perf_counter() - began) * 1000
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors[0] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["connections"]) as pool:
+            for _ in range(options["connections"]):
+                pool.submit(client)
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "errors": errors[0],
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        }
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.seeding import require_scratch_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs loadtest on the feed and like endpoints under the baseline and tuned SQLite "
+        "profiles (see settings.SQLITE_PROFILES) against the same database and prints the deltas. "
+        "Point CONNECTLY_DB_PATH at a scratch database before running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--posts", type=int, default=10_000)
+        parser.add_argument("--scenarios", default="feed,like")
+        parser.add_argument("--profiles", default="baseline,tuned",
+                            help="Profiles to run in order; later runs are compared with the first.")
+
+    def handle(self, *args, **options):
+        # Checked here too so a refusal does not surface as a failed loadtest subprocess.
+        require_scratch_database()
+        profiles = [name.strip() for name in options["profiles"].split(",") if name.strip()]
+        with tempfile.TemporaryDirectory() as workdir:
+            first = None
+            for profile in profiles:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"SQLite profile: {profile}"))
+                report = os.path.join(workdir, f"{profile}.json")
+                command = [
+                    sys.executable, "manage.py", "loadtest",
+                    "--requests", str(options["requests"]),
+                    "--concurrency", str(options["concurrency"]),
+                    "--posts", str(options["posts"]),
+                    "--scenarios", options["scenarios"],
+                    "--label", profile,
+                    "--output", report,
+                ]
+                if first:
+                    command += ["--compare", first]
+                # Each profile runs in its own process because settings are read at startup.
+                env = dict(os.environ, CONNECTLY_SQLITE_PROFILE=profile)
+                result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+                self.stdout.write(result.stdout)
+                if result.returncode:
+                    self.stderr.write(result.stderr)
+                    return
+                first = first or report
@@ -0,0 +1,185 @@
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Post
+from posts.seeding import require_scratch_database, seed_users, seed_posts, seed_tokens
+
+# Relative weight of each endpoint in the default mix.
+SCENARIO_WEIGHTS = {"feed": 5, "posts": 2, "like": 1, "unlike": 1, "comment": 1}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample["ms"] for sample in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample["status"] >= 400),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "queries_per_request": round(sum(s["queries"] for s in samples) / len(samples), 2) if samples else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the feed, post list, like/unlike and comment endpoints in-process from concurrent "
+        "threads and reports latency percentiles, throughput and queries per request. Seeds into "
+        "CONNECTLY_DB_PATH, which must point at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Total timed requests.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Worker threads.")
+        parser.add_argument("--warmup", type=int, default=100, help="Untimed requests sent first.")
+        parser.add_argument("--scenarios", default=",".join(SCENARIO_WEIGHTS),
+                            help="Comma-separated subset of: " + ", ".join(SCENARIO_WEIGHTS))
+        parser.add_argument("--users", type=int, default=100, help="Seeded users to drive requests as.")
+        parser.add_argument("--posts", type=int, default=10_000, help="Seed posts until at least this many exist.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--label", default="", help="Free-form label stored in the report.")
+        parser.add_argument("--output", help="Write the JSON report to this path.")
+        parser.add_argument("--compare", help="Previous JSON report to print deltas against.")
+
+    def handle(self, *args, **options):
+        require_scratch_database()
+        scenarios = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+        unknown = set(scenarios) - set(SCENARIO_WEIGHTS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        users = seed_users(options["users"])
+        tokens = list(seed_tokens(users).values())
+        missing = options["posts"] - Post.objects.count()
+        if missing > 0:
+            self.stdout.write(f"Seeding {missing} posts...")
+            seed_posts(users, missing, seed=options["seed"])
+        post_ids = list(Post.objects.filter(privacy="public").values_list("pk", flat=True)[:5000])
+        connection.close()
+
+        rng = random.Random(options["seed"])
+        weights = [SCENARIO_WEIGHTS[name] for name in scenarios]
+        plan = [
+            (rng.choices(scenarios, weights)[0], rng.choice(tokens), rng.choice(post_ids), rng.randint(1, 5))
+            for _ in range(options["warmup"] + options["requests"])
+        ]
+
+        self.run_plan(plan[:options["warmup"]], options["concurrency"])
+        started = time.perf_counter()
+        samples = self.run_plan(plan[options["warmup"]:], options["concurrency"])
+        elapsed = time.perf_counter() - started
+
+        report = {
+            "label": options["label"],
+            "commit": self.git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": {key: options[key] for key in ("requests", "concurrency", "warmup", "users", "posts", "seed")},
+            "database": settings.DATABASES["default"]["ENGINE"],
+            "total": summarize(samples, elapsed),
+            "endpoints": {
+                name: summarize([s for s in samples if s["scenario"] == name], elapsed) for name in scenarios
+            },
+        }
+
+        self.print_report(report)
+        if options["compare"]:
+            with open(options["compare"]) as handle:
+                self.print_comparison(json.load(handle), report)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def run_plan(self, plan, concurrency):
+        if not plan:
+            return []
+        local = threading.local()
+
+        def execute(step):
+            if not hasattr(local, "client"):
+                local.client = Client(SERVER_NAME="localhost", raise_request_exception=False)
+            scenario, token, post_id, page = step
+            headers = {"HTTP_AUTHORIZATION": f"Token {token}"}
+            with CaptureQueriesContext(connection) as queries:
+                began = time.perf_counter()
+                response = self.send(local.client, scenario, post_id, page, headers)
+                ms = (time.perf_counter() - began) * 1000
+            return {"scenario": scenario, "status": response.status_code, "ms": ms, "queries": len(queries)}
+
+        def worker(chunk):
+            try:
+                return [execute(step) for step in chunk]
+            finally:
+                connection.close()
+
+        chunks = [plan[i::concurrency] for i in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return [sample for result in pool.map(worker, chunks) for sample in result]
+
+    @staticmethod
+    def send(client, scenario, post_id, page, headers):
+        if scenario == "feed":
+            return client.get("/api/feed/", {"page": page}, **headers)
+        if scenario == "posts":
+            return client.get("/api/posts/", {"cursor": ""}, **headers)
+        if scenario == "comment":
+            return client.post(f"/api/posts/{post_id}/comment/", {"comment": "Load test"}, **headers)
+        return client.post(f"/api/posts/{post_id}/{scenario}/", **headers)
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{'endpoint':<10} {'reqs':>6} {'err':>5} {'rps':>9} "
+            f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'q/req':>6}"
+        )
+        rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+        for name, stats in rows:
+            if not stats["requests"]:
+                continue
+            self.stdout.write(
+                f"{name:<10} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput_rps']:>9} "
+                f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['queries_per_request']:>6}"
+            )
+
+    def print_comparison(self, baseline, report):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Compared with {baseline.get('label') or baseline.get('commit') or 'baseline'}"
+        ))
+        for name, stats in list(report["endpoints"].items()) + [("TOTAL", report["total"])]:
+            before = baseline["total"] if name == "TOTAL" else baseline.get("endpoints", {}).get(name)
+            if not before or not before.get("requests") or not stats["requests"]:
+                continue
+            deltas = []
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+                if before[metric]:
+                    deltas.append(f"{metric} {100 * (stats[metric] - before[metric]) / before[metric]:+.1f}%")
+            self.stdout.write(f"{name:<10} " + ", ".join(deltas))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index from the posts table, e.g. after a bulk import."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt the {type(backend).__name__} index over {Post.objects.count()} post(s)."
+        ))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from posts.models import Post, UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Repairs drift between Post.likes_count/comments_count and the Like and Comment tables, "
+        "and between UserProfile.posts_count and the Post table. Meant to run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drifted posts without fixing them.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows updated per statement.")
+
+    def handle(self, *args, **options):
+        drifted = (
+            Post.objects.with_counts()
+            .filter(~Q(likes_count=F("num_likes")) | ~Q(comments_count=F("num_comments")))
+            .values_list("pk", flat=True)
+        )
+
+        fixed = 0
+        batch = []
+        for pk in drifted.iterator(chunk_size=options["batch_size"]):
+            batch.append(pk)
+            if len(batch) >= options["batch_size"]:
+                fixed += self.apply(batch, options["dry_run"])
+                batch = []
+        fixed += self.apply(batch, options["dry_run"])
+
+        profiles = self.reconcile_profiles(options["batch_size"], options["dry_run"])
+
+        verb = "Found" if options["dry_run"] else "Reconciled"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {fixed} post(s) with drifted counters."))
+        self.stdout.write(self.style.SUCCESS(f"{verb} {profiles} profile(s) with drifted post counts."))
+
+    def reconcile_profiles(self, batch_size, dry_run):
+        """Recounts drifted profiles inside the UPDATE itself, so creates racing the repair are not lost."""
+        drifted = (
+            UserProfile.objects.annotate(num_posts=UserProfile.objects.post_count())
+            .exclude(posts_count=F("num_posts"))
+            .values_list("pk", flat=True)
+        )
+        fixed = 0
+        batch = []
+        for pk in drifted.iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) >= batch_size:
+                fixed += self.apply_profiles(batch, dry_run)
+                batch = []
+        return fixed + self.apply_profiles(batch, dry_run)
+
+    def apply_profiles(self, batch, dry_run):
+        if dry_run or not batch:
+            return len(batch)
+        UserProfile.objects.filter(pk__in=batch).update(posts_count=UserProfile.objects.post_count())
+        return len(batch)
+
+    def apply(self, batch, dry_run):
+        """Recounts drifted posts inside the UPDATE itself, so likes and comments racing the repair are not lost."""
+        if dry_run or not batch:
+            return len(batch)
+        Post.objects.filter(pk__in=batch).update(**Post.objects.real_counts())
+        return len(batch)
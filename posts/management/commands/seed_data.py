@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.seeding import seed_users, seed_posts, seed_tokens
+
+
+class Command(BaseCommand):
+    help = "Bulk-inserts users, posts, likes and comments for benchmarks and load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--posts", type=int, default=10_000)
+        parser.add_argument("--likes-per-post", type=int, default=5, help="Average likes per post.")
+        parser.add_argument("--comments-per-post", type=int, default=2, help="Average comments per post.")
+        parser.add_argument("--private-ratio", type=float, default=0.1)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible corpora.")
+
+    def handle(self, *args, **options):
+        users = seed_users(options["users"])
+        seed_tokens(users)
+        created = seed_posts(
+            users,
+            options["posts"],
+            likes_per_post=options["likes_per_post"],
+            comments_per_post=options["comments_per_post"],
+            private_ratio=options["private_ratio"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {created['posts']} posts, "
+            f"{created['likes']} likes and {created['comments']} comments."
+        ))
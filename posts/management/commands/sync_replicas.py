@@ -0,0 +1,37 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database into every replica in DATABASE_REPLICAS with the "
+        "online backup API, once or every --interval seconds, to stand in for replication locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="Keep syncing with this many seconds between copies.")
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES["default"]
+        replicas = [settings.DATABASES[alias] for alias in settings.DATABASE_REPLICAS]
+        if not replicas:
+            raise CommandError("No replicas configured; set CONNECTLY_REPLICA_PATHS.")
+        if any(db["ENGINE"] != "django.db.backends.sqlite3" for db in [primary, *replicas]):
+            raise CommandError("sync_replicas only copies SQLite files; use the database's own replication.")
+
+        while True:
+            started = time.perf_counter()
+            with closing(sqlite3.connect(primary["NAME"])) as source:
+                for replica in replicas:
+                    with closing(sqlite3.connect(replica["NAME"])) as target:
+                        source.backup(target)
+            self.stdout.write(
+                f"Synced {len(replicas)} replica(s) in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,143 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar("request_metrics", default=None)
+
+# Upper bounds, in seconds, of the request duration histogram.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RequestMetrics:
+    """Per-request tallies of SQL queries, DB time, serializer time and cache lookups."""
+    __slots__ = ("queries", "db_seconds", "serializer_seconds", "cache_hits", "cache_misses", "_serializer_depth")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._serializer_depth = 0
+
+    def server_timing(self, total_seconds):
+        return ", ".join([
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"',
+            f"serializer;dur={self.serializer_seconds * 1000:.2f}",
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f"total;dur={total_seconds * 1000:.2f}",
+        ])
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper installed on every connection by ``posts.signals``.
+
+    Metrics live in a context variable, so queries issued from ``sync_to_async``
+    threads under ASGI are attributed to the request that awaited them.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_seconds += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def record_cache(hits=0, misses=0):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+@contextmanager
+def serializer_timer():
+    """Times serialization, counting only the outermost serializer when they nest."""
+    metrics = _current.get()
+    if metrics is None or metrics._serializer_depth:
+        yield
+        return
+    metrics._serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_seconds += time.perf_counter() - started
+        metrics._serializer_depth -= 1
+
+
+class MetricsRegistry:
+    """Process-wide aggregates rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, view, method, status, metrics, total_seconds):
+        key = (view, method, str(status))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "requests": 0, "duration": 0.0, "queries": 0, "db": 0.0, "serializer": 0.0,
+                    "cache_hits": 0, "cache_misses": 0, "buckets": [0] * len(DURATION_BUCKETS),
+                }
+            series["requests"] += 1
+            series["duration"] += total_seconds
+            series["queries"] += metrics.queries
+            series["db"] += metrics.db_seconds
+            series["serializer"] += metrics.serializer_seconds
+            series["cache_hits"] += metrics.cache_hits
+            series["cache_misses"] += metrics.cache_misses
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if total_seconds <= bound:
+                    series["buckets"][index] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def render(self):
+        with self._lock:
+            snapshot = {key: dict(series, buckets=list(series["buckets"])) for key, series in self._series.items()}
+
+        counters = [
+            ("connectly_requests_total", "counter", "Requests handled.", "requests"),
+            ("connectly_db_queries_total", "counter", "SQL queries issued.", "queries"),
+            ("connectly_db_seconds_total", "counter", "Time spent in the database.", "db"),
+            ("connectly_serializer_seconds_total", "counter", "Time spent serializing responses.", "serializer"),
+            ("connectly_cache_hits_total", "counter", "Cache lookups that hit.", "cache_hits"),
+            ("connectly_cache_misses_total", "counter", "Cache lookups that missed.", "cache_misses"),
+        ]
+        lines = []
+        for name, kind, help_text, field in counters:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (view, method, status), series in sorted(snapshot.items()):
+                lines.append(f'{name}{{view="{view}",method="{method}",status="{status}"}} {series[field]}')
+
+        name = "connectly_request_duration_seconds"
+        lines += [f"# HELP {name} Request latency.", f"# TYPE {name} histogram"]
+        for (view, method, status), series in sorted(snapshot.items()):
+            labels = f'view="{view}",method="{method}",status="{status}"'
+            for bound, count in zip(DURATION_BUCKETS, series["buckets"]):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {series["requests"]}')
+            lines.append(f"{name}_sum{{{labels}}} {series['duration']}")
+            lines.append(f"{name}_count{{{labels}}} {series['requests']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,91 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics, routers
+
+
+class RequestMetricsMiddleware:
+    """Records per-request query count, DB time, serializer time and cache hits.
+
+    The numbers are sent back in a ``Server-Timing`` header and aggregated for the
+    Prometheus endpoint served by ``posts.views.MetricsView``. The middleware runs
+    natively under both WSGI and ASGI so it never forces async views onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_metrics, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, request_metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, request_metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, request_metrics, total):
+        response["Server-Timing"] = request_metrics.server_timing(total)
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        metrics.registry.observe(view, request.method, response.status_code, request_metrics, total)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Gives PrimaryReplicaRouter the current request and pins writers to the primary.
+
+    After a successful POST, PUT, PATCH or DELETE by an authenticated user, that
+    user's reads stay on the primary for ``REPLICA_PIN_SECONDS`` so they see their
+    own write even when the replicas lag.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = routers.start_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = routers.start_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if request.method not in routers.SAFE_METHODS and response.status_code < 400:
+            user = routers.resolved_user(request)
+            if user is not None and user.is_authenticated:
+                routers.pin_to_primary(user.pk)
+        return response
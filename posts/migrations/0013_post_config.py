@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:04
+
+from django.db import migrations, models
+
+
+def create_config_row(apps, schema_editor):
+    """Creates the single row up front so updates only ever lock it, never race to insert it."""
+    PostConfig = apps.get_model('posts', 'PostConfig')
+    PostConfig.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('data', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_config_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_posts_count(apps, schema_editor):
+    """Counts existing posts once so the quota starts from the real totals."""
+    Post = apps.get_model('posts', 'Post')
+    UserProfile = apps.get_model('posts', 'UserProfile')
+    posts = (
+        Post.objects.filter(author=OuterRef('user_id'))
+        .order_by().values('author').annotate(total=Count('pk')).values('total')
+    )
+    UserProfile.objects.update(posts_count=Coalesce(Subquery(posts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_config'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_posts_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Existing comments were last changed when they were made."""
+    Comment = apps.get_model('posts', 'Comment')
+    Comment.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_userprofile_posts_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-updated_at'], name='comment_post_updated_idx'),
+        ),
+    ]
@@ -1,8 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 
 User = get_user_model()
 
@@ -13,6 +13,16 @@ def get_default_user():
     return user.id if user else None
 
 
+class UserProfileQuerySet(models.QuerySet):
+    def post_count(self):
+        """The real number of posts by each profile's user, as a subquery expression."""
+        posts = (
+            Post.objects.filter(author=OuterRef("user_id"))
+            .order_by().values("author").annotate(total=Count("pk")).values("total")
+        )
+        return Coalesce(Subquery(posts), 0)
+
+
 class UserProfile(models.Model):
     """Extends the user model to include role-based access control"""
     ROLE_CHOICES = [
@@ -26,6 +36,12 @@ class UserProfile(models.Model):
         related_name="profile" 
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='user')
+    # Denormalized number of the user's posts, reserved by PostFactory before each create
+    # and lowered when a post is deleted; enforces max_posts_per_user without a COUNT.
+    # Repaired by the reconcile_post_counters management command.
+    posts_count = models.PositiveIntegerField(default=0)
+
+    objects = UserProfileQuerySet.as_manager()
 
     def is_admin(self):
         return self.role == 'admin'
@@ -35,15 +51,42 @@ class UserProfile(models.Model):
 
 
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.get_or_create(user=instance)
-
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+class PostQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Public posts plus, for a signed-in user, their own private posts.
+
+        The rule is written as a CASE rather than an OR: SQLite answers the OR with a
+        union of the privacy and author indexes followed by a sort of every match,
+        while the CASE lets it walk (created_at, id) in order and stop at LIMIT.
+        """
+        if user is None or not user.is_authenticated:
+            return self.filter(privacy="public")
+        visible = Case(
+            When(Q(privacy="public") | Q(author_id=user.pk), then=Value(True)),
+            default=Value(False),
+            output_field=models.BooleanField(),
+        )
+        return self.alias(is_visible=visible).filter(is_visible=True)
+
+    def real_counts(self):
+        """The real like and comment totals of each post, as subquery expressions keyed by counter column."""
+        likes = (
+            Like.objects.filter(post=OuterRef("pk"))
+            .order_by().values("post").annotate(total=Count("pk")).values("total")
+        )
+        comments = (
+            Comment.objects.filter(post=OuterRef("pk"))
+            .order_by().values("post").annotate(total=Count("pk")).values("total")
+        )
+        return {
+            "likes_count": Coalesce(Subquery(likes), 0),
+            "comments_count": Coalesce(Subquery(comments), 0),
+        }
+
+    def with_counts(self):
+        """Annotates the real like and comment totals, computed from the Like and Comment tables."""
+        counts = self.real_counts()
+        return self.annotate(num_likes=counts["likes_count"], num_comments=counts["comments_count"])
 
 
 class Post(models.Model):
@@ -62,12 +105,30 @@ class Post(models.Model):
     privacy = models.CharField(max_length=10, choices=PRIVACY_CHOICES, default='public')  
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized totals, kept in step by the like/comment write paths with F() updates
+    # and repaired by the reconcile_post_counters management command.
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (created_at, id) in descending order.
+            models.Index(fields=["-created_at", "-id"], name="post_created_id_idx"),
+            # NewsFeedView filters on privacy and sorts by creation date.
+            models.Index(fields=["privacy", "-created_at", "-id"], name="post_privacy_created_idx"),
+            # Owner-scoped lookups: PostRetrieveUpdateDeleteView and per-author listings.
+            models.Index(fields=["author", "-created_at", "-id"], name="post_author_created_idx"),
+            # Exports walk posts in (updated_at, id) order.
+            models.Index(fields=["updated_at", "id"], name="post_updated_id_idx"),
+        ]
 
     def is_visible_to(self, user):
-        """Checks if the post is visible to a given user"""
-        if self.privacy == 'public' or self.author == user:
+        """Checks if the post is visible to a given user; same rule as PostQuerySet.visible_to."""
+        if self.privacy == 'public':
             return True
-        return False
+        return user is not None and user.is_authenticated and self.author_id == user.pk
 
     def __str__(self):
         return self.title
@@ -86,21 +147,83 @@ class Like(models.Model):
         return f"{self.user.username} liked {self.post.title}"
 
 
+class CommentQuerySet(models.QuerySet):
+    def latest_per_post(self, limit):
+        """The newest ``limit`` comments of each post, in one windowed query.
+
+        ROW_NUMBER() over each post's (created_at, id) order is filtered in an outer
+        query, so at most ``limit`` rows per post are read into memory no matter how
+        many comments a post has. Rows come back grouped by post, newest first.
+        """
+        return self._first_per_post(limit, [F("created_at").desc(), F("id").desc()])
+
+    def oldest_per_post(self, limit):
+        """The oldest ``limit`` comments of each post, like latest_per_post but oldest first."""
+        return self._first_per_post(limit, [F("created_at").asc(), F("id").asc()])
+
+    def _first_per_post(self, limit, order):
+        return (
+            self.annotate(row=Window(RowNumber(), partition_by=[F("post_id")], order_by=order))
+            .filter(row__lte=limit)
+            .order_by("post_id", *order)
+        )
+
+    def delete(self):
+        """Deletes the comments and lowers their posts' comments_count with one UPDATE."""
+        from .interactions import counter_delta_case
+
+        with transaction.atomic(using=self.db):
+            per_post = dict(self.order_by().values_list("post").annotate(total=Count("pk")))
+            deleted, per_model = super().delete()
+            posts = Post.objects.filter(pk__in=per_post)
+            if per_model.get(self.model._meta.label, 0) == sum(per_post.values()):
+                posts.update(comments_count=F("comments_count") - counter_delta_case(per_post))
+            else:
+                # A concurrent delete removed some of these comments first; count what is left.
+                posts.update(comments_count=Post.objects.real_counts()["comments_count"])
+        return deleted, per_model
+
+
 class Comment(models.Model):
     """Model for post comments"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, related_name="comments", on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
-    def __str__(self):
-        return f"{self.user.username} commented on {self.post.title}"
-
-
-
-
-
+    objects = CommentQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "-created_at", "-id"], name="comment_post_created_id_idx"),
+            # PostCommentsView's ETag reads the most recently changed comment of a post.
+            models.Index(fields=["post", "-updated_at"], name="comment_post_updated_idx"),
+        ]
 
+    def __str__(self):
+        return f"{self.user.username} commented on {self.post.title}"
 
+    def delete(self, using=None, keep_parents=False):
+        """Deletes the comment and lowers its post's comments_count, as comment_on_post raised it."""
+        with transaction.atomic(using=using):
+            deleted, per_model = super().delete(using, keep_parents)
+            if deleted:
+                Post.objects.filter(pk=self.post_id, comments_count__gt=0).update(
+                    comments_count=F("comments_count") - 1
+                )
+        return deleted, per_model
+
+
+class PostConfig(models.Model):
+    """Post settings shared by every worker; a single row read through PostConfigManager.
+
+    ``data`` holds only the settings changed from their defaults. ``version``
+    moves on every update so workers can tell when their snapshot is stale.
+    """
+    version = models.PositiveIntegerField(default=0)
+    data = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    def __str__(self):
+        return f"Post config v{self.version}"
@@ -1,6 +1,119 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page-number pagination with an opt-in keyset mode on (created_at, id).
+
+    Sending ``?cursor=`` (empty for the first page) switches to keyset mode, which
+    seeks past the last row seen instead of using OFFSET and never runs COUNT(*).
+    """
+    cursor_query_param = "cursor"
+    ordering = ("-created_at", "-id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        rows = list(self.seek(queryset, position)[:page_size + 1])
+        rows, self.next_position = self.split_page(rows, page_size)
+        return rows
+
+    @staticmethod
+    def seek(queryset, position):
+        """Restricts an ordered queryset to rows after the (created_at, id) position."""
+        if position is None:
+            return queryset
+        created_at, pk = position
+        # The redundant created_at bound lets the index seek instead of scanning the OR.
+        return queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(id__lt=pk)
+        )
+
+    @staticmethod
+    def split_page(rows, page_size):
+        """Trims the look-ahead row and returns the page with the next position, if any."""
+        if len(rows) <= page_size:
+            return rows, None
+        rows = rows[:page_size]
+        return rows, (rows[-1].created_at, rows[-1].pk)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({"next": self.get_next_cursor_link(), "results": data})
+
+    def get_offset_response(self, request, data, page_number, total):
+        """Builds a page-number response for rows sliced from a precomputed ID list."""
+        page_size = self.get_page_size(request)
+        if page_number > 1 and (page_number - 1) * page_size >= total:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message="That page contains no results"
+            ))
+
+        url = request.build_absolute_uri()
+        next_link = None
+        if page_number * page_size < total:
+            next_link = replace_query_param(url, self.page_query_param, page_number + 1)
+        previous_link = None
+        if page_number == 2:
+            previous_link = remove_query_param(url, self.page_query_param)
+        elif page_number > 2:
+            previous_link = replace_query_param(url, self.page_query_param, page_number - 1)
+        return Response({"count": total, "next": next_link, "previous": previous_link, "results": data})
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def encode_cursor(self, created_at, pk):
+        raw = f"{created_at.isoformat()}|{pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, encoded):
+        """Returns the (created_at, id) position, or None for the first page."""
+        if not encoded:
+            return None
+        try:
+            created_at, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split("|")
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class PostPagination(KeysetPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+class SearchPagination(PostPagination):
+    """Cursor pages over search hits, keyed on (rank, id) instead of (created_at, id)."""
+
+    def encode_cursor(self, rank, pk):
+        return base64.urlsafe_b64encode(f"{rank!r}|{pk}".encode()).decode()
 
-class PostPagination(PageNumberPagination):
-    page_size = 10 
-    page_size_query_param = 'page_size'  
-    max_page_size = 50  
+    def decode_cursor(self, encoded):
+        """Returns the (rank, id) position, or None for the first page."""
+        if not encoded:
+            return None
+        try:
+            rank, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split("|")
+            return float(rank), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,112 @@
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+from .cache import feed_changed_within
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Credentials and sessions are read right after they are written (login, token
+# rotation), so they always come from the primary.
+PRIMARY_ONLY_APPS = {"auth", "authtoken", "sessions", "account", "socialaccount"}
+DEFAULT_PIN_SECONDS = 5
+
+_routing = contextvars.ContextVar("replica_routing", default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def pin_key(user_id):
+    return f"db:pin:user:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Sends the user's reads to the primary until replicas have caught up with their write."""
+    timeout = getattr(settings, "REPLICA_PIN_SECONDS", DEFAULT_PIN_SECONDS)
+    cache.set(pin_key(user_id), True, timeout=timeout)
+
+
+class RequestRouting:
+    """Per-request routing state: the replica chosen for the request and the user's pin."""
+
+    def __init__(self, request, replica):
+        self.request = request
+        self.replica = replica
+        self._pinned = None
+
+    @property
+    def reads_from_replica(self):
+        if self.replica is None or self.request.method not in SAFE_METHODS:
+            return False
+        if self._pinned is None:
+            # Until DRF has authenticated the request the user may still be anonymous,
+            # so only an authenticated user's pin is remembered for the request.
+            user = resolved_user(self.request)
+            if user is None or not user.is_authenticated:
+                return True
+            self._pinned = bool(cache.get(pin_key(user.pk)))
+        return not self._pinned
+
+
+def start_request(request):
+    """Binds routing state to the current context; returns the token for end_request."""
+    replicas = replica_aliases()
+    return _routing.set(RequestRouting(request, random.choice(replicas) if replicas else None))
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+def replica_read_may_be_stale():
+    """True when the current request reads from a replica that may lag the latest feed change.
+
+    Pages built from such reads are served but not cached, or the lagging view
+    would outlive the replication delay under the new feed generation.
+    """
+    routing = _routing.get()
+    if routing is None or not routing.reads_from_replica:
+        return False
+    return feed_changed_within(getattr(settings, "REPLICA_PIN_SECONDS", DEFAULT_PIN_SECONDS))
+
+
+def resolved_user(request):
+    """The request's user if authentication has already run, without triggering a lookup."""
+    user = getattr(request, "user", None)
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return None
+    return user
+
+
+class PrimaryReplicaRouter:
+    """Routes reads of safe requests to a replica and everything else to the primary.
+
+    Each request reads from one randomly chosen replica in ``DATABASE_REPLICAS`` so
+    its queries see a single snapshot and load spreads across replicas. Reads go to
+    the primary for unsafe methods, inside a transaction, outside a request (shell,
+    management commands), for credential models, and for REPLICA_PIN_SECONDS after
+    the user's last successful write.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.replica if routing.reads_from_replica else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        return obj1._state.db in aliases and obj2._state.db in aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
@@ -0,0 +1,22 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Both tiers in process memory, so a test run never clears or fills the file or
+# Redis cache that a running server shares.
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "connectly-tests"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "connectly-tests-shared"},
+}
+
+
+class ConnectlyTestRunner(DiscoverRunner):
+    """Runs the suite against TEST_CACHES instead of the configured cache servers."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches_override = override_settings(CACHES=TEST_CACHES)
+        self._caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches_override.disable()
+        super().teardown_test_environment(**kwargs)
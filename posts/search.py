@@ -0,0 +1,156 @@
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+FTS_TABLE = "posts_post_fts"
+MAX_QUERY_TERMS = 16
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(text):
+    """Splits free text into at most MAX_QUERY_TERMS lowercase word terms."""
+    return [term.lower() for term in TERM_RE.findall(text or "")][:MAX_QUERY_TERMS]
+
+
+class BaseSearchBackend:
+    """Full-text index over post titles and content.
+
+    ``search`` returns (post_id, rank) pairs ordered by rank ascending (best first)
+    and then by id descending, limited to posts the user may see. ``position`` is
+    the (rank, id) of the last hit already returned, so pages never use OFFSET.
+    """
+
+    def index(self, posts):
+        """Adds or replaces the index entries of saved posts."""
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Re-indexes every post, e.g. after a bulk import that skipped the signals."""
+        raise NotImplementedError
+
+    def search(self, text, user, position=None, limit=10):
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 index ranked with bm25, where a title hit outweighs a content hit.
+
+    The virtual table (created by migration 0012) holds only the text; privacy is
+    read from ``posts_post`` at query time so privacy changes apply immediately.
+    """
+
+    def __init__(self, title_weight=4.0, content_weight=1.0, **options):
+        self.title_weight = title_weight
+        self.content_weight = content_weight
+
+    def index(self, posts):
+        rows = [(post.pk, post.title, post.content) for post in posts]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)", rows
+                )
+
+    def remove(self, post_ids):
+        post_ids = list(post_ids)
+        if post_ids:
+            with connection.cursor() as cursor:
+                cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in post_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, content) SELECT id, title, content FROM posts_post"
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+    @staticmethod
+    def match_expression(terms):
+        """Quotes every term so user input is never parsed as FTS5 syntax; the last is a prefix."""
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += "*"
+        return " ".join(quoted)
+
+    def search(self, text, user, position=None, limit=10):
+        terms = query_terms(text)
+        if not terms:
+            return []
+        params = [self.title_weight, self.content_weight, self.match_expression(terms)]
+        # Same rule as PostQuerySet.visible_to.
+        visibility = "p.privacy = 'public'"
+        if user is not None and user.is_authenticated:
+            visibility = "(p.privacy = 'public' OR p.author_id = %s)"
+            params.append(user.pk)
+        seek = ""
+        if position is not None:
+            seek = "WHERE rank > %s OR (rank = %s AND id < %s)"
+            params += [position[0], position[0], position[1]]
+        params.append(limit)
+
+        sql = f"""
+            SELECT id, rank FROM (
+                SELECT {FTS_TABLE}.rowid AS id, bm25({FTS_TABLE}, %s, %s) AS rank
+                FROM {FTS_TABLE} JOIN posts_post p ON p.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH %s AND {visibility}
+            ) {seek}
+            ORDER BY rank, id DESC
+            LIMIT %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(pk, rank) for pk, rank in cursor.fetchall()]
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Portable fallback for databases without a configured full-text backend.
+
+    Every term must appear in the title or content (``icontains``); hits are not
+    scored, so all share rank 0.0 and come back newest first. This scans the posts
+    table and is meant for development, not large corpora.
+    """
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, text, user, position=None, limit=10):
+        from .models import Post
+
+        terms = query_terms(text)
+        if not terms:
+            return []
+        queryset = Post.objects.visible_to(user)
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        if position is not None:
+            queryset = queryset.filter(id__lt=position[1])
+        return [(pk, 0.0) for pk in queryset.order_by("-id").values_list("pk", flat=True)[:limit]]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Returns the process-wide backend configured by ``settings.SEARCH``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, "SEARCH", {})
+                backend_class = import_string(config.get("BACKEND", "posts.search.DatabaseSearchBackend"))
+                _backend = backend_class(**config.get("OPTIONS", {}))
+    return _backend
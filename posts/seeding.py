@@ -0,0 +1,104 @@
+import random
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from rest_framework.authtoken.models import Token
+
+from .factories import UserFactory
+from .interactions import counter_delta_case
+from .models import Post, Like, Comment, UserProfile
+from .search import get_search_backend
+from .timeline import get_timeline_backend
+
+User = get_user_model()
+
+
+def require_scratch_database():
+    """Raises CommandError if the default database is the checked-in development one.
+
+    The benchmark commands seed thousands of rows; CONNECTLY_DB_PATH points them
+    at a scratch file instead.
+    """
+    name = connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]
+    if Path(name).resolve() == (Path(settings.BASE_DIR) / "db.sqlite3").resolve():
+        raise CommandError(
+            f"Refusing to seed the development database {name}; "
+            "set CONNECTLY_DB_PATH to a scratch database path."
+        )
+
+
+def seed_users(count, prefix="seed_user", batch_size=1000):
+    """Tops seeded users up to ``count`` with unusable passwords and their profiles."""
+    existing = User.objects.filter(username__startswith=f"{prefix}_").count()
+    users = [User(username=f"{prefix}_{i}", password="!") for i in range(existing, count)]
+    UserFactory.bulk_create_users(users, batch_size=batch_size)
+    return list(User.objects.filter(username__startswith=f"{prefix}_").order_by("id")[:count])
+
+
+def seed_tokens(users):
+    """Bulk-creates auth tokens for users that do not have one yet."""
+    has_token = set(Token.objects.filter(user__in=users).values_list("user_id", flat=True))
+    Token.objects.bulk_create(
+        [Token(user=user, key=Token.generate_key()) for user in users if user.pk not in has_token]
+    )
+    return dict(Token.objects.filter(user__in=users).values_list("user_id", "key"))
+
+
+def seed_posts(users, count, likes_per_post=5, comments_per_post=2, private_ratio=0.1,
+               batch_size=5000, seed=0, progress=None):
+    """Bulk-inserts posts with likes and comments, one transaction per batch.
+
+    Like and comment counts per post are drawn up front so the denormalized counters
+    are written with the posts instead of being recomputed afterwards, and authors'
+    post counts are raised by one UPDATE per batch. bulk_create
+    skips the model signals, so each batch is added to the search index explicitly
+    and the timelines, which miss the seeded posts, are dropped at the end.
+    """
+    rng = random.Random(seed)
+    user_ids = [user.pk for user in users]
+    created = {"posts": 0, "likes": 0, "comments": 0}
+
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        like_plan = [rng.sample(user_ids, min(rng.randint(0, likes_per_post * 2), len(user_ids)))
+                     for _ in range(size)]
+        comment_plan = [rng.randint(0, comments_per_post * 2) for _ in range(size)]
+
+        posts = [
+            Post(
+                author_id=rng.choice(user_ids),
+                title=f"Seeded post {start + i}",
+                content=f"Seeded content {start + i} " * rng.randint(1, 8),
+                privacy="private" if rng.random() < private_ratio else "public",
+                likes_count=len(like_plan[i]),
+                comments_count=comment_plan[i],
+            )
+            for i in range(size)
+        ]
+        with transaction.atomic():
+            Post.objects.bulk_create(posts, batch_size=batch_size)
+            get_search_backend().index(posts)
+            likes = [Like(user_id=user_id, post_id=post.pk)
+                     for post, likers in zip(posts, like_plan) for user_id in likers]
+            comments = [Comment(user_id=rng.choice(user_ids), post_id=post.pk, content=f"Seeded comment {n}")
+                        for post, total in zip(posts, comment_plan) for n in range(total)]
+            Like.objects.bulk_create(likes, batch_size=batch_size, ignore_conflicts=True)
+            Comment.objects.bulk_create(comments, batch_size=batch_size)
+            per_author = Counter(post.author_id for post in posts)
+            UserProfile.objects.filter(user_id__in=per_author).update(
+                posts_count=F("posts_count") + counter_delta_case(per_author, field="user_id")
+            )
+
+        created["posts"] += size
+        created["likes"] += len(likes)
+        created["comments"] += len(comments)
+        if progress:
+            progress(created)
+    # Cold timelines reload from the database, seeded posts included.
+    get_timeline_backend().clear()
+    return created
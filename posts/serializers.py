@@ -1,9 +1,24 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
 from .models import Post, Like, Comment, UserProfile
+from .fieldsets import LeanListSerializer, SparseFieldsMixin
+from .metrics import serializer_timer
+from .pagination import PostPagination
 
 User = get_user_model()
 
+
+class TimedSerializerMixin:
+    """Reports serialization time to the request metrics middleware."""
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer for user profile, including role-based access control"""
     class Meta:
@@ -12,25 +27,30 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model, includes role from UserProfile"""
-    role = serializers.CharField(source="userprofile.role", read_only=True)
+    role = serializers.CharField(source="profile.role", read_only=True)
 
     class Meta:
         model = User
         fields = ["id", "username", "email", "first_name", "last_name", "role"]
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Posts, including privacy settings"""
+    expandable_fields = ("author",)
+    # Keyset pagination and fragment cache keys read these on every list.
+    always_load = ("id", "created_at", "updated_at", "likes_count", "comments_count")
+
     title = serializers.CharField(max_length=255, required=True)
     content = serializers.CharField(required=True)
     privacy = serializers.ChoiceField(choices=[("public", "Public"), ("private", "Private")], required=True)
     
-    likes_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
+    likes_count = serializers.IntegerField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
     author = UserSerializer(read_only=True)  # ✅ Show author details
 
     class Meta:
         model = Post
         fields = "__all__"
+        list_serializer_class = LeanListSerializer
 
     def validate_title(self, value):
         if len(value) < 5:
@@ -43,49 +63,124 @@ class PostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Invalid privacy setting.")
         return value
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+class VisiblePostField(serializers.PrimaryKeyRelatedField):
+    """Resolves a post ID only among posts the requesting user may see.
+
+    The visibility rule is part of the lookup query, so a private post of someone
+    else is reported as missing without a second fetch or per-object check.
+    """
+    default_error_messages = {
+        "does_not_exist": "Post not found.",
+    }
+
+    def get_queryset(self):
+        request = self.context.get("request")
+        return Post.objects.visible_to(getattr(request, "user", None))
+
 
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+class LikeSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = ("user",)
+    always_load = ("id", "created_at")
 
-class LikeSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
+    post = VisiblePostField()
     
     class Meta:
         model = Like
         fields = ["id", "user", "post", "created_at"]
+        list_serializer_class = LeanListSerializer
 
-    def validate(self, data):
-        """Prevent users from liking posts they don't have access to."""
-        post = data["post"]
-        user = self.context["request"].user
-
-        if not post.is_visible_to(user):
-            raise serializers.ValidationError("You do not have permission to like this post.")
-        
-        return data
+class CommentSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = ("user",)
+    always_load = ("id", "created_at")
 
-class CommentSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
+    post = VisiblePostField()
 
     class Meta:
         model = Comment
         fields = ["id", "user", "post", "content", "created_at"]
         read_only_fields = ["user"]  
+        list_serializer_class = LeanListSerializer
+
+
+DEFAULT_COMMENT_PREVIEW = 3
+
+
+class FeedPostListSerializer(LeanListSerializer):
+    """Loads the comment previews of a whole page with one windowed query."""
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, "all") else data)
+        if not {"latest_comments", "comments_next"} & set(self.child.fields):
+            return super().to_representation(posts)
+        commented = [post.pk for post in posts if post.comments_count]
+        previews = {}
+        if commented:
+            comments = (
+                Comment.objects.filter(post_id__in=commented)
+                .latest_per_post(self.child.preview_size())
+                .select_related("user__profile")
+            )
+            for comment in comments:
+                previews.setdefault(comment.post_id, []).append(comment)
+        for post in posts:
+            post.latest_comments = previews.get(post.pk, [])
+        return super().to_representation(posts)
+
+
+class FeedPostSerializer(PostSerializer):
+    """A post as shown in the feed: the newest comments plus a link to load the rest.
+
+    The preview holds at most ``settings.FEED_COMMENT_PREVIEW`` comments per post.
+    ``comments_next`` is a cursor page of the post's comments that continues after
+    the preview, or None when the preview already shows them all.
+    """
+    fragment_prefix = "feed_post_fragment"
+
+    latest_comments = serializers.SerializerMethodField()
+    comments_next = serializers.SerializerMethodField()
+
+    class Meta(PostSerializer.Meta):
+        list_serializer_class = FeedPostListSerializer
+
+    @staticmethod
+    def preview_size():
+        return getattr(settings, "FEED_COMMENT_PREVIEW", DEFAULT_COMMENT_PREVIEW)
+
+    def preview(self, post):
+        if not hasattr(post, "latest_comments"):
+            post.latest_comments = list(
+                Comment.objects.filter(post=post).select_related("user__profile")
+                .order_by("-created_at", "-id")[:self.preview_size()]
+            )
+        return post.latest_comments
+
+    def get_latest_comments(self, post):
+        return CommentSerializer(self.preview(post), many=True, context=self.context).data
+
+    def get_comments_next(self, post):
+        preview = self.preview(post)
+        if not preview or post.comments_count <= len(preview):
+            return None
+        url = reverse("post-comments", args=[post.pk])
+        request = self.context.get("request")
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        cursor = PostPagination().encode_cursor(preview[-1].created_at, preview[-1].pk)
+        return replace_query_param(url, PostPagination.cursor_query_param, cursor)
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    """A single like, unlike or comment operation inside a batch request."""
+    OPERATIONS = [("like", "Like"), ("unlike", "Unlike"), ("comment", "Comment")]
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    post = serializers.IntegerField()
+    comment = serializers.CharField(required=False, allow_blank=True)
 
     def validate(self, data):
-        """Prevent users from commenting on posts they don’t have access to."""
-        post = data["post"]
-        user = self.context["request"].user
-
-        if not post.is_visible_to(user):
-            raise serializers.ValidationError("You do not have permission to comment on this post.")
-        
+        if data["op"] == "comment" and not data.get("comment"):
+            raise serializers.ValidationError("Comment cannot be empty.")
         return data
 
-
-
-
@@ -1,20 +1,137 @@
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from .models import UserProfile, Post, Like, Comment
+from .cache import bump_feed_version
+from .interactions import counter_delta_case
+from .timeline import fan_out_post, sync_post, remove_post
+from .search import get_search_backend
+from .metrics import record_query
+from .db import configure_sqlite_connection
+from .authentication import token_cache
+from rest_framework.authtoken.models import Token
 
 User = get_user_model()
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    """Ensures a UserProfile is created only if it doesn’t exist."""
-    if created and not UserProfile.objects.filter(user=instance).exists():
-        UserProfile.objects.create(user=instance)
+def provision_user_profile(sender, instance, created, raw=False, **kwargs):
+    """Creates the profile of a newly registered user with a single INSERT.
+
+    Later saves (such as the last_login update on every login) do not touch the
+    profile. Bulk imports go through UserFactory.bulk_create_users instead.
+    """
+    if created and not raw:
+        UserProfile.objects.bulk_create([UserProfile(user=instance)], ignore_conflicts=True)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_feed_cache(sender, **kwargs):
+    """Moves the feed to a new cache generation once a post, like or comment change commits.
+
+    Bumping inside the writer's transaction would let a reader rebuild the page
+    from the old snapshot and cache it under the new generation.
+    """
+    transaction.on_commit(bump_feed_version)
+
+
+@receiver(post_save, sender=Post)
+def sync_post_timelines(sender, instance, created, **kwargs):
+    """Fans new posts out and keeps the timelines in step with privacy changes, once committed.
+
+    Every way of saving a post goes through here (the factory, the admin, the
+    shell), so no new post is missing from the timelines.
+    """
+    if created:
+        transaction.on_commit(lambda: fan_out_post(instance))
+    else:
+        transaction.on_commit(lambda: sync_post(instance))
+
+
+@receiver(post_delete, sender=Post)
+def release_post_slot(sender, instance, **kwargs):
+    """Returns the deleted post's slot in its author's max_posts_per_user quota."""
+    UserProfile.objects.filter(user_id=instance.author_id, posts_count__gt=0).update(
+        posts_count=F("posts_count") - 1
+    )
+
+
+@receiver(pre_delete, sender=User)
+def release_cascaded_comment_counts(sender, instance, **kwargs):
+    """Lowers comments_count on other authors' posts for the comments a user deletion cascades to.
+
+    Comment.delete and CommentQuerySet.delete handle direct deletes; comments on the
+    user's own posts go with those posts, so they are skipped.
+    """
+    per_post = dict(
+        Comment.objects.filter(user=instance).exclude(post__author=instance)
+        .order_by().values_list("post").annotate(total=Count("pk"))
+    )
+    if per_post:
+        Post.objects.filter(pk__in=per_post).update(
+            comments_count=F("comments_count") - counter_delta_case(per_post)
+        )
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_timelines(sender, instance, **kwargs):
+    post_id, author_id = instance.pk, instance.author_id
+    transaction.on_commit(lambda: remove_post(post_id, author_id))
+
+
+@receiver(post_save, sender=Post)
+def index_post_for_search(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Re-indexes a post in the same transaction as its save, unless its text did not change."""
+    if raw or (update_fields is not None and not {"title", "content"} & set(update_fields)):
+        return
+    get_search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_search(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Applies the SQLite tuning profile (WAL, synchronous, caches, busy timeout)."""
+    configure_sqlite_connection(connection)
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    """Lets RequestMetricsMiddleware count queries on every database connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def revoke_cached_tokens(user_id):
+    # After commit, so no worker reloads the old row and keeps it past the revocation.
+    transaction.on_commit(lambda: token_cache.revoke_user(user_id))
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """Revokes cached tokens in every worker on logout or rotation."""
+    token_cache.discard(instance.key)
+    revoke_cached_tokens(instance.user_id)
+
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Ensures the user profile is saved when the user is updated."""
-    if hasattr(instance, "userprofile"):
-        instance.userprofile.save()
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    revoke_cached_tokens(instance.pk)
+
 
+@receiver(post_save, sender=UserProfile)
+def invalidate_cached_profile_tokens(sender, instance, **kwargs):
+    revoke_cached_tokens(instance.user_id)
 
@@ -1,17 +1,132 @@
+import threading
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+DEFAULT_POST_CONFIG = {"max_posts_per_user": 10, "allow_comments": True}
+CONFIG_VERSION_KEY = "post_config:version"
+DEFAULT_REFRESH_INTERVAL = 1.0
+
+
 class SingletonMeta(type):
     """A metaclass for implementing Singleton Pattern"""
     _instances = {}
+    _lock = threading.Lock()
 
     def __call__(cls, *args, **kwargs):
         if cls not in cls._instances:
-            cls._instances[cls] = super().__call__(*args, **kwargs)
+            with cls._lock:
+                if cls not in cls._instances:
+                    cls._instances[cls] = super().__call__(*args, **kwargs)
         return cls._instances[cls]
 
 
 class PostConfigManager(metaclass=SingletonMeta):
-    """Singleton class to manage post configurations"""
+    """Singleton class to manage post configurations
+
+    The configuration lives in the single PostConfig row, so every worker shares
+    it. Each process reads an immutable snapshot held in one attribute, without
+    locks or queries. At most every ``POST_CONFIG["REFRESH_INTERVAL"]`` seconds one
+    reader compares the snapshot's version with the version published in the cache
+    and reloads the row if it moved. Updates lock the row, merge, bump the version
+    and publish it in one transaction, so concurrent updates never drop each
+    other's changes and other workers see them within one refresh interval.
+    """
+
     def __init__(self):
-        self.settings = {"max_posts_per_user": 10, "allow_comments": True}
+        config = getattr(settings, "POST_CONFIG", {})
+        self.refresh_interval = config.get("REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL)
+        self._snapshot = (None, MappingProxyType(dict(DEFAULT_POST_CONFIG)))
+        self._next_check = 0.0
+        self._refresh_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @property
+    def settings(self):
+        return self.get_config()
+
+    @property
+    def version(self):
+        self.get_config()
+        return self._snapshot[0]
+
+    def get_config(self):
+        """Returns the current settings as a read-only mapping."""
+        if time.monotonic() >= self._next_check:
+            self._refresh()
+        return self._snapshot[1]
+
+    def get(self, name):
+        return self.get_config()[name]
+
+    def _refresh(self):
+        # Readers that lose the race keep serving the current snapshot.
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() < self._next_check:
+                return
+            published = cache.get(CONFIG_VERSION_KEY)
+            if published is None or published != self._snapshot[0]:
+                self._load(published=published)
+            self._next_check = time.monotonic() + self.refresh_interval
+        finally:
+            self._refresh_lock.release()
+
+    def reload(self):
+        """Replaces the snapshot with the stored row, even if it is older; returns its settings."""
+        return self._load(force=True)
+
+    def _load(self, force=False, published=None):
+        from .models import PostConfig
+
+        version, data = (
+            PostConfig.objects.using(DEFAULT_DB_ALIAS).filter(pk=1).values_list("version", "data").first()
+            or (0, {})
+        )
+        # A row that matches the published version is current even if it is older
+        # than the snapshot, which happens once a deleted row has been recreated.
+        self._install(version, data, force or version == published)
+        cache.add(CONFIG_VERSION_KEY, version, timeout=None)
+        return self._snapshot[1]
+
+    def update_config(self, changes):
+        """Merges ``changes`` into the shared settings atomically; returns the new settings.
+
+        Raises ValueError for unknown settings, values of the wrong type and
+        negative numbers.
+        """
+        from .models import PostConfig
 
+        if not isinstance(changes, dict):
+            raise ValueError("Config must be an object.")
+        for name, value in changes.items():
+            if name not in DEFAULT_POST_CONFIG:
+                raise ValueError(f"Unknown setting '{name}'.")
+            if type(value) is not type(DEFAULT_POST_CONFIG[name]):
+                raise ValueError(f"'{name}' must be of type {type(DEFAULT_POST_CONFIG[name]).__name__}.")
+            if isinstance(value, int) and not isinstance(value, bool) and value < 0:
+                raise ValueError(f"'{name}' must not be negative.")
 
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            # The migration creates the row, but a flush (or a TransactionTestCase) removes it.
+            config, created = PostConfig.objects.select_for_update().get_or_create(pk=1)
+            if created:
+                # Continue past every version still cached, so snapshots keep moving forward.
+                config.version = max(cache.get(CONFIG_VERSION_KEY) or 0, self._snapshot[0] or 0)
+            config.data = {**config.data, **changes}
+            config.version += 1
+            config.save()
+            # Published under the row lock, so versions reach the cache in commit order.
+            cache.set(CONFIG_VERSION_KEY, config.version, timeout=None)
+        self._install(config.version, config.data)
+        return self._snapshot[1]
 
+    def _install(self, version, data, force=False):
+        # A refresh that read the row before a local update committed must not undo it.
+        with self._write_lock:
+            if force or self._snapshot[0] is None or version >= self._snapshot[0]:
+                self._snapshot = (version, MappingProxyType({**DEFAULT_POST_CONFIG, **data}))
@@ -1,3 +1,1342 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.management import CommandError, call_command
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, transaction
+from django.test import AsyncClient, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from .models import Post, PostConfig, Like, Comment, UserProfile
+from .authentication import TokenCache, token_cache
+from .cache import bump_feed_version, get_feed_version, get_or_build, lease_key, serialize_posts
+from .cache_backends import TwoTierCache
+from .factories import PostFactory, PostQuotaExceeded, UserFactory
+from . import export, likebuffer, routers, seeding, timeline
+from .interactions import comment_on_post
+from .management.commands.reconcile_post_counters import Command as ReconcileCommand
+from .metrics import registry
+from .serializers import PostSerializer, LikeSerializer, CommentSerializer
+from .singleton import CONFIG_VERSION_KEY, PostConfigManager, SingletonMeta
+from .timeline import (
+    GLOBAL_TIMELINE, InMemoryTimelineBackend, RedisTimelineBackend,
+    get_timeline_backend, private_timeline, warm_global_timeline, warm_private_timeline,
+)
+
+User = get_user_model()
+
+
+class ConnectlyTestCase(APITestCase):
+    """Resets process-wide caches and timelines that outlive the test transaction."""
+
+    def setUp(self):
+        cache.clear()
+        get_timeline_backend().clear()
+        PostConfigManager().reload()
+
+
+class NewsFeedCacheTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="alice", password="pass12345")
+        self.post = Post.objects.create(author=self.user, title="Hello world", content="First post")
+        self.client.force_authenticate(self.user)
+
+    def test_like_invalidates_cached_feed(self):
+        first = self.client.get(reverse("news-feed"))
+        self.assertEqual(first.data["results"][0]["likes_count"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("like-post", args=[self.post.id]))
+
+        second = self.client.get(reverse("news-feed"))
+        self.assertEqual(second.data["results"][0]["likes_count"], 1)
+
+    def test_cache_key_covers_page_size(self):
+        Post.objects.create(author=self.user, title="Second post", content="More")
+
+        self.assertEqual(len(self.client.get(reverse("news-feed"), {"page_size": 1}).data["results"]), 1)
+        self.assertEqual(len(self.client.get(reverse("news-feed"), {"page_size": 2}).data["results"]), 2)
+
+    def test_feed_version_moves_only_once_the_write_commits(self):
+        version = get_feed_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            comment_on_post(self.user, self.post, "Pending")
+            Like.objects.create(user=self.user, post=self.post)
+            # A reader rebuilding now must not cache the old snapshot under a new version.
+            self.assertEqual(get_feed_version(), version)
+        self.assertNotEqual(get_feed_version(), version)
+
+
+class KeysetPaginationTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="bob", password="pass12345")
+        self.posts = [
+            Post.objects.create(author=self.user, title=f"Post number {i}", content="Body")
+            for i in range(5)
+        ]
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_walks_every_post_once_without_count(self):
+        seen = []
+        url = reverse("post-list") + "?cursor=&page_size=2"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertFalse(any(q["sql"].startswith("SELECT COUNT(*)") for q in queries.captured_queries))
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse("news-feed"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class PostCountQueryTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="carol", password="pass12345")
+        self.client.force_authenticate(self.user)
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.user, title=f"Counted post {i}", content="Body")
+            self.client.post(reverse("like-post", args=[post.id]))
+            self.client.post(reverse("comment-post", args=[post.id]), {"comment": "Nice"})
+        warm_global_timeline()
+        warm_private_timeline(self.user)
+
+    def count_queries(self, url_name, page_size):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name), {"page_size": page_size})
+        self.assertEqual(len(response.data["results"]), page_size)
+        self.assertTrue(all(item["likes_count"] == 1 for item in response.data["results"]))
+        self.assertTrue(all(item["comments_count"] == 1 for item in response.data["results"]))
+        return len(queries)
+
+    def test_query_count_is_independent_of_page_size(self):
+        self.create_posts(20)
+        for url_name in ("news-feed", "post-list"):
+            self.assertEqual(self.count_queries(url_name, 2), self.count_queries(url_name, 20))
+
+
+@override_settings(FEED_COMMENT_PREVIEW=2)
+class CommentPreviewTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="cora", password="pass12345")
+        self.client.force_authenticate(self.user)
+        self.busy = Post.objects.create(author=self.user, title="Busy thread", content="Body")
+        self.quiet = Post.objects.create(author=self.user, title="Quiet thread", content="Body")
+        self.comments = [comment_on_post(self.user, self.busy, f"Comment {i}") for i in range(5)]
+        comment_on_post(self.user, self.quiet, "Only one")
+
+    def test_feed_items_carry_latest_comments_from_one_windowed_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("news-feed"))
+        items = {item["id"]: item for item in response.data["results"]}
+        windowed = [q for q in queries.captured_queries if "ROW_NUMBER()" in q["sql"]]
+        self.assertEqual(len(windowed), 1)
+
+        busy = items[self.busy.id]
+        self.assertEqual([c["content"] for c in busy["latest_comments"]], ["Comment 4", "Comment 3"])
+        self.assertIsNotNone(busy["comments_next"])
+        self.assertEqual([c["content"] for c in items[self.quiet.id]["latest_comments"]], ["Only one"])
+        self.assertIsNone(items[self.quiet.id]["comments_next"])
+
+    def test_comments_next_loads_the_rest_of_the_thread(self):
+        url = self.client.get(reverse("news-feed")).data["results"][1]["comments_next"] + "&page_size=2"
+        loaded = []
+        while url:
+            response = self.client.get(url)
+            loaded.extend(c["content"] for c in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(loaded, ["Comment 2", "Comment 1", "Comment 0"])
+
+    def test_new_comment_refreshes_cached_preview(self):
+        self.client.get(reverse("news-feed"))
+        comment_on_post(self.user, self.quiet, "Second")
+        bump_feed_version()
+        item = next(i for i in self.client.get(reverse("news-feed")).data["results"] if i["id"] == self.quiet.id)
+        self.assertEqual([c["content"] for c in item["latest_comments"]], ["Second", "Only one"])
+
+
+class SparseFieldsetTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="sina", password="pass12345")
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(author=self.user, title="Sparse post", content="A long body")
+        comment_on_post(self.user, self.post, "First!")
+
+    def test_fields_and_expand_narrow_feed_items_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("news-feed"), {"fields": "title,author", "expand": ""})
+        self.assertEqual(
+            response.data["results"], [{"id": self.post.id, "title": "Sparse post", "author": self.user.id}]
+        )
+        post_queries = [q["sql"] for q in queries.captured_queries if 'FROM "posts_post"' in q["sql"]]
+        self.assertTrue(post_queries)
+        self.assertFalse(any('"posts_post"."content"' in sql or "auth_user" in sql for sql in post_queries))
+
+        full = self.client.get(reverse("news-feed")).data["results"][0]
+        self.assertEqual(full["author"]["username"], "sina")
+        self.assertIn("content", full)
+
+    def test_comments_collapse_user_to_its_id(self):
+        url = reverse("post-comments", args=[self.post.id])
+        response = self.client.get(url, {"fields": "content,user", "expand": ""})
+        self.assertEqual(
+            [dict(item) for item in response.data["results"]],
+            [{"id": self.post.comments.get().id, "user": self.user.id, "content": "First!"}],
+        )
+
+    def test_unknown_fields_are_rejected(self):
+        self.assertEqual(self.client.get(reverse("news-feed"), {"fields": "title,secret"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("post-list"), {"expand": "title"}).status_code, 400)
+
+    def test_lean_list_matches_drf_representation(self):
+        posts = list(Post.objects.select_related("author__profile"))
+        comments = list(Comment.objects.select_related("user__profile"))
+        for serializer_class, instances in ((PostSerializer, posts), (CommentSerializer, comments)):
+            regular = serializers.ListSerializer(child=serializer_class(), instance=instances).data
+            self.assertEqual(serializer_class(instances, many=True).data, [dict(item) for item in regular])
+
+
+class ConditionalRequestTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="etta", password="pass12345")
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(author=self.user, title="Conditional post", content="Body")
+
+    def test_unchanged_feed_is_not_modified_without_queries(self):
+        response = self.client.get(reverse("news-feed"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(reverse("news-feed"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("like-post", args=[self.post.id]))
+        changed = self.client.get(reverse("news-feed"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+
+    def test_comments_are_validated_by_newest_comment(self):
+        url = reverse("post-comments", args=[self.post.id])
+        etag = self.client.get(url)["ETag"]
+        with mock.patch.object(CommentSerializer, "to_representation") as to_representation:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        to_representation.assert_not_called()
+
+        comment_on_post(self.user, self.post, "New comment")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_comment_edits_and_deletes_change_the_etag(self):
+        url = reverse("post-comments", args=[self.post.id])
+        older = comment_on_post(self.user, self.post, "Older")
+        comment_on_post(self.user, self.post, "Newer")
+        etag = self.client.get(url)["ETag"]
+
+        older.content = "Edited"
+        older.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][1]["content"], "Edited")
+
+        etag = response["ETag"]
+        older.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_patch_with_stale_etag_is_rejected(self):
+        url = reverse("post-detail", args=[self.post.id])
+        etag = self.client.get(url)["ETag"]
+        updated = self.client.patch(url, {"title": "Edited title"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated["ETag"], etag)
+
+        stale = self.client.patch(url, {"title": "Lost update"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(stale.status_code, 412)
+        privacy = self.client.patch(reverse("post-privacy", args=[self.post.id]), {"privacy": "private"},
+                                    HTTP_IF_MATCH=etag)
+        self.assertEqual(privacy.status_code, 412)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.privacy), ("Edited title", "public"))
+
+        current = self.client.patch(reverse("post-privacy", args=[self.post.id]), {"privacy": "private"},
+                                    HTTP_IF_MATCH=updated["ETag"])
+        self.assertEqual(current.status_code, 200)
+
+
+class PostConfigManagerTests(ConnectlyTestCase):
+    def worker(self):
+        """A second process's manager: same store, separate snapshot."""
+        return type.__call__(PostConfigManager)
+
+    def test_manager_is_a_singleton(self):
+        managers = []
+        threads = [threading.Thread(target=lambda: managers.append(PostConfigManager())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(manager is managers[0] for manager in managers))
+        self.assertIs(managers[0], SingletonMeta._instances[PostConfigManager])
+
+    def test_update_reaches_other_workers_after_refresh(self):
+        worker = self.worker()
+        self.assertEqual(worker.get("max_posts_per_user"), 10)
+        PostConfigManager().update_config({"max_posts_per_user": 3})
+        self.assertEqual(PostConfigManager().get("max_posts_per_user"), 3)
+        self.assertEqual(worker.get("max_posts_per_user"), 10)  # snapshot still fresh
+
+        worker._next_check = 0
+        with self.assertNumQueries(1):
+            self.assertEqual(worker.get("max_posts_per_user"), 3)
+        with self.assertNumQueries(0):
+            worker._next_check = 0
+            worker.get_config()
+        self.assertEqual(worker.version, cache.get(CONFIG_VERSION_KEY))
+
+    def test_updates_merge_and_bump_the_version(self):
+        manager = PostConfigManager()
+        start = manager.version
+        other = self.worker()
+        other.update_config({"allow_comments": False})
+        manager.update_config({"max_posts_per_user": 5})
+        self.assertEqual(manager.version, start + 2)
+        self.assertEqual(dict(manager.get_config()), {"max_posts_per_user": 5, "allow_comments": False})
+        with self.assertRaises(TypeError):
+            manager.get_config()["allow_comments"] = True
+
+    def test_invalid_updates_are_rejected(self):
+        manager = PostConfigManager()
+        for changes in (
+            {"unknown": 1}, {"max_posts_per_user": "5"}, {"allow_comments": 1}, {"max_posts_per_user": -1},
+            ["max_posts_per_user"],
+        ):
+            with self.assertRaises(ValueError):
+                manager.update_config(changes)
+        self.assertEqual(manager.version, 0)
+
+    def test_update_recreates_a_missing_row(self):
+        PostConfig.objects.all().delete()
+        data = PostConfigManager().update_config({"max_posts_per_user": 4})
+        self.assertEqual(data["max_posts_per_user"], 4)
+        self.assertEqual(PostConfig.objects.get(pk=1).version, 1)
+
+    def test_workers_follow_a_recreated_row(self):
+        worker = self.worker()
+        for limit in (2, 3):
+            PostConfigManager().update_config({"max_posts_per_user": limit})
+        worker._next_check = 0
+        self.assertEqual(worker.get("max_posts_per_user"), 3)
+        PostConfig.objects.all().delete()
+        PostConfigManager().update_config({"max_posts_per_user": 4})
+        self.assertEqual(PostConfig.objects.get(pk=1).version, 3)
+
+        # With the published version gone too, the row restarts below the snapshots.
+        PostConfig.objects.all().delete()
+        cache.clear()
+        self.worker().update_config({"max_posts_per_user": 5})
+        for manager in (worker, PostConfigManager()):
+            manager._next_check = 0
+            self.assertEqual(manager.get("max_posts_per_user"), 5)
+            with self.assertNumQueries(0):
+                manager._next_check = 0
+                manager.get_config()
+
+    def test_config_view(self):
+        url = reverse("singleton")
+        self.assertEqual(self.client.get(url).data["data"], {"max_posts_per_user": 10, "allow_comments": True})
+
+        user = User.objects.create_user(username="cora", password="pass12345")
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.post(url, {"config": {"allow_comments": False}}, format="json").status_code, 403)
+
+        admin = User.objects.create_superuser(username="root", password="pass12345")
+        self.client.force_authenticate(admin)
+        response = self.client.post(url, {"config": {"allow_comments": False}}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["version"], 1)
+        self.assertFalse(response.data["data"]["allow_comments"])
+        for config in ({"allow_comments": "no"}, {"max_posts_per_user": -1}):
+            response = self.client.post(url, {"config": config}, format="json")
+            self.assertEqual(response.status_code, 400)
+
+
+class PostCounterTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="dave", password="pass12345")
+        self.post = Post.objects.create(author=self.user, title="Counter post", content="Body")
+        self.client.force_authenticate(self.user)
+
+    def test_like_unlike_and_comment_update_counters(self):
+        self.client.post(reverse("like-post", args=[self.post.id]))
+        self.client.post(reverse("like-post", args=[self.post.id]))
+        self.client.post(reverse("comment-post", args=[self.post.id]), {"comment": "First"})
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 1))
+
+        self.client.post(reverse("unlike-post", args=[self.post.id]))
+        self.client.post(reverse("unlike-post", args=[self.post.id]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def post_updates(self, queries):
+        return [query["sql"] for query in queries.captured_queries if query["sql"].startswith('UPDATE "posts_post"')]
+
+    def test_comment_deletes_lower_each_post_once(self):
+        other = Post.objects.create(author=self.user, title="Other post", content="Body")
+        for post in (self.post, self.post, other):
+            comment_on_post(self.user, post, "Doomed")
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.filter(user=self.user).delete()
+        self.assertEqual(len(self.post_updates(queries)), 1)
+        self.assertEqual(list(Post.objects.values_list("comments_count", flat=True)), [0, 0])
+
+    def test_cascades_release_only_surviving_posts(self):
+        commenter = User.objects.create_user(username="dina", password="pass12345")
+        own = Post.objects.create(author=commenter, title="Own post", content="Body")
+        for post in (self.post, self.post, own, own):
+            comment_on_post(commenter, post, "Cascaded")
+        with CaptureQueriesContext(connection) as queries:
+            commenter.delete()
+        self.assertEqual(len(self.post_updates(queries)), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        Like.objects.create(user=self.user, post=self.post)
+        Comment.objects.create(user=self.user, post=self.post, content="Untracked")
+
+        call_command("reconcile_post_counters", stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 1))
+
+    def test_reconcile_keeps_likes_made_during_the_repair(self):
+        Like.objects.create(user=self.user, post=self.post)
+        other = User.objects.create_user(username="dora", password="pass12345")
+        apply = ReconcileCommand.apply
+
+        def like_then_apply(command, batch, dry_run):
+            Like.objects.create(user=other, post=self.post)
+            return apply(command, batch, dry_run)
+
+        with mock.patch.object(ReconcileCommand, "apply", like_then_apply):
+            call_command("reconcile_post_counters", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+
+
+class PostQuotaTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="quinn", password="pass12345")
+        PostConfigManager().update_config({"max_posts_per_user": 2})
+
+    def posts_count(self):
+        return UserProfile.objects.get(user=self.user).posts_count
+
+    def test_factory_enforces_the_limit_without_counting(self):
+        with CaptureQueriesContext(connection) as queries:
+            PostFactory.create_post(self.user, "One", "Body")
+            PostFactory.create_post(self.user, "Two", "Body")
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries.captured_queries))
+        with self.assertRaises(PostQuotaExceeded):
+            PostFactory.create_post(self.user, "Three", "Body")
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
+        self.assertEqual(self.posts_count(), 2)
+
+    def test_reservation_is_conditional(self):
+        PostFactory.create_post(self.user, "One", "Body")
+        self.assertTrue(PostFactory.reserve_post_slot(self.user, 2))
+        self.assertFalse(PostFactory.reserve_post_slot(self.user, 2))
+        self.assertEqual(self.posts_count(), 2)
+
+    def test_deleting_a_post_frees_a_slot(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("post-list")
+        data = {"title": "Quota post", "content": "Body", "privacy": "public"}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, data).status_code, 201)
+        self.assertEqual(self.client.post(url, data).status_code, 403)
+
+        Post.objects.filter(author=self.user).first().delete()
+        self.assertEqual(self.posts_count(), 1)
+        self.assertEqual(self.client.post(url, data).status_code, 201)
+
+    def test_missing_profile_is_created_with_the_real_count(self):
+        Post.objects.create(author=self.user, title="Before quotas", content="Body")
+        UserProfile.objects.filter(user=self.user).delete()
+        PostFactory.create_post(self.user, "Two", "Body")
+        self.assertEqual(self.posts_count(), 2)
+
+    def test_reconcile_command_repairs_post_counts(self):
+        Post.objects.create(author=self.user, title="Untracked", content="Body")
+        out = StringIO()
+        call_command("reconcile_post_counters", stdout=out)
+        self.assertIn("Reconciled 1 profile(s)", out.getvalue())
+        self.assertEqual(self.posts_count(), 1)
+
+
+class FakeRedis:
+    """Local stand-in implementing the slice of the redis-py API the timeline backend uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def register_script(self, script):
+        run = {timeline._PUSH_SCRIPT: self._push, timeline._LOAD_SCRIPT: self._load}[script]
+        return lambda keys, args: run(keys, args)
+
+    def _push(self, keys, args):
+        key, truncated = keys
+        member, score, max_length = args
+        if self.exists(truncated):
+            oldest = self.zrange(key, 0, 0, withscores=True)
+            if oldest and score < oldest[0][1]:
+                return 0
+        added = self.zadd(key, {member: score})
+        if self.zremrangebyrank(key, 0, -(max_length + 1)):
+            self.set(truncated, 1)
+            if self.zscore(key, member) is None:
+                return 0
+        return added
+
+    def _load(self, keys, args):
+        key, truncated, warm = keys
+        max_length, was_truncated, pairs = args[0], args[1], args[2:]
+        self.zadd(key, dict(zip(pairs[::2], pairs[1::2])))
+        if self.zremrangebyrank(key, 0, -(max_length + 1)) or was_truncated:
+            self.set(truncated, 1)
+        else:
+            self.delete(truncated)
+        self.set(warm, 1)
+
+    def zadd(self, key, mapping):
+        zset = self.data.setdefault(key, {})
+        added = sum(1 for member in mapping if str(member) not in zset)
+        zset.update({str(member): score for member, score in mapping.items()})
+        return added
+
+    def zrem(self, key, member):
+        return 1 if self.data.get(key, {}).pop(str(member), None) is not None else 0
+
+    def _ranked(self, key):
+        return sorted(self.data.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    def zrevrange(self, key, start, end):
+        return [member.encode() for member, _ in reversed(self._ranked(key))][start:end + 1]
+
+    def zremrangebyrank(self, key, start, end):
+        ranked = self._ranked(key)
+        stop = max(len(ranked) + end + 1, 0) if end < 0 else end + 1
+        doomed = ranked[start:stop]
+        for member, _ in doomed:
+            del self.data[key][member]
+        return len(doomed)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def decr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) - 1
+        return self.data[key]
+
+    def zrange(self, key, start, end, withscores=False):
+        ranked = self._ranked(key)[start:end + 1 if end >= 0 else None]
+        return [(member.encode(), score) for member, score in ranked] if withscores else [
+            member.encode() for member, _ in ranked
+        ]
+
+    def zscore(self, key, member):
+        return self.data.get(key, {}).get(str(member))
+
+    def zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match.rstrip("*"))]
+
+
+class TimelineTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="erin", password="pass12345")
+        self.client.force_authenticate(self.user)
+        # The feed only reads shared timelines; every worker would see this one.
+        patcher = mock.patch.object(timeline, "_backend", RedisTimelineBackend(client=FakeRedis()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backends_keep_newest_ids_within_bound(self):
+        for backend in (InMemoryTimelineBackend(max_length=3), RedisTimelineBackend(max_length=3, client=FakeRedis())):
+            for post_id in range(1, 6):
+                backend.push("t", post_id, float(post_id))
+            backend.remove("t", 4)
+            # An evicted post pushed again would leave a gap behind the oldest entry.
+            self.assertFalse(backend.push("t", 1, 1.0))
+
+            self.assertEqual(backend.range("t", 0, 10), [5, 3])
+            self.assertEqual(backend.range("t", 1, 1), [3])
+            self.assertEqual(backend.total("t"), 2)
+            self.assertTrue(backend.is_truncated("t"))
+
+            backend.load("u", [(1, 1.0), (2, 2.0)])
+            self.assertEqual((backend.total("u"), backend.is_truncated("u")), (2, False))
+
+    def test_load_keeps_posts_pushed_while_warming(self):
+        for backend in (InMemoryTimelineBackend(max_length=3), RedisTimelineBackend(max_length=3, client=FakeRedis())):
+            backend.push("t", 9, 9.0)
+            backend.load("t", [(1, 1.0), (2, 2.0)])
+            self.assertEqual(backend.range("t", 0, 10), [9, 2, 1])
+            self.assertFalse(backend.is_truncated("t"))
+
+            backend.load("t", [(3, 3.0)])
+            self.assertEqual(backend.range("t", 0, 10), [9, 3, 2])
+            self.assertTrue(backend.is_truncated("t"))
+
+    def test_new_posts_fan_out_on_commit_and_feed_reads_timeline(self):
+        warm_global_timeline()
+        with self.captureOnCommitCallbacks(execute=True):
+            public = PostFactory.create_post(self.user, "Public post", "Body")
+            private = PostFactory.create_post(self.user, "Private post", "Body", privacy="private")
+            self.assertEqual(get_timeline_backend().range(GLOBAL_TIMELINE, 0, 10), [])
+
+        backend = get_timeline_backend()
+        self.assertEqual(backend.range(GLOBAL_TIMELINE, 0, 10), [public.id])
+        self.assertEqual(backend.range(private_timeline(self.user.id), 0, 10), [private.id])
+
+        reader = User.objects.create_user(username="fred", password="pass12345")
+        warm_private_timeline(reader)
+        self.client.force_authenticate(reader)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("news-feed"))
+        self.assertEqual([item["id"] for item in response.data["results"]], [public.id])
+        self.assertEqual(response.data["count"], 1)
+
+    def test_posts_made_outside_the_factory_reach_the_feed(self):
+        first = Post.objects.create(author=self.user, title="First post", content="Body")
+        reader = User.objects.create_user(username="gail", password="pass12345")
+        self.client.force_authenticate(reader)
+        self.assertEqual(self.client.get(reverse("news-feed")).data["count"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = Post.objects.create(author=self.user, title="Second post", content="Body")
+        for backend in (get_timeline_backend(), InMemoryTimelineBackend()):
+            with self.subTest(shared=backend.shared), mock.patch.object(timeline, "_backend", backend):
+                cache.clear()
+                response = self.client.get(reverse("news-feed"))
+                self.assertEqual(response.data["count"], 2)
+                self.assertEqual([item["id"] for item in response.data["results"]], [second.id, first.id])
+
+    def test_truncated_timeline_counts_from_the_database(self):
+        backend = RedisTimelineBackend(max_length=2, client=FakeRedis())
+        posts = [Post.objects.create(author=self.user, title=f"Post {n}", content="Body") for n in range(3)]
+        reader = User.objects.create_user(username="hank", password="pass12345")
+        self.client.force_authenticate(reader)
+        with mock.patch.object(timeline, "_backend", backend):
+            response = self.client.get(reverse("news-feed"), {"page_size": 2})
+            self.assertTrue(backend.is_truncated(GLOBAL_TIMELINE))
+            self.assertEqual(response.data["count"], 3)
+            self.assertEqual([item["id"] for item in response.data["results"]], [posts[2].id, posts[1].id])
+            page = self.client.get(reverse("news-feed"), {"page_size": 2, "page": 2})
+            self.assertEqual([item["id"] for item in page.data["results"]], [posts[0].id])
+
+            # The count is reused until the feed moves to a new generation.
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("news-feed"), {"page_size": 1, "page": 2})
+            self.assertFalse(any("COUNT(" in query["sql"] for query in queries.captured_queries))
+
+    def test_privacy_change_and_delete_leave_global_timeline(self):
+        warm_global_timeline()
+        with self.captureOnCommitCallbacks(execute=True):
+            post = PostFactory.create_post(self.user, "Soon private", "Body")
+        with self.captureOnCommitCallbacks(execute=True):
+            post.privacy = "private"
+            post.save()
+        self.assertEqual(get_timeline_backend().range(GLOBAL_TIMELINE, 0, 10), [])
+        self.assertEqual(get_timeline_backend().range(private_timeline(self.user.id), 0, 10), [post.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(get_timeline_backend().range(private_timeline(self.user.id), 0, 10), [])
+
+    def test_per_process_backends_get_no_fan_out(self):
+        backend = InMemoryTimelineBackend()
+        with mock.patch.object(timeline, "_backend", backend), mock.patch.object(backend, "push") as push:
+            with self.captureOnCommitCallbacks(execute=True):
+                PostFactory.create_post(self.user, "Unread fan-out", "Body")
+        push.assert_not_called()
+
+
+class PostFragmentCacheTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="frank", password="pass12345")
+        self.post = Post.objects.create(author=self.user, title="Original title", content="Body")
+
+    def serialize(self):
+        return serialize_posts([Post.objects.get(pk=self.post.pk)], PostSerializer, {})[0]
+
+    def test_fragments_are_reused_until_post_changes(self):
+        self.assertEqual(self.serialize()["title"], "Original title")
+
+        Post.objects.filter(pk=self.post.pk).update(title="Silently changed")
+        self.assertEqual(self.serialize()["title"], "Original title")
+
+        self.post.title = "Edited title"
+        self.post.save()
+        self.assertEqual(self.serialize()["title"], "Edited title")
+
+    def test_counter_updates_rebuild_fragment(self):
+        self.serialize()
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse("like-post", args=[self.post.id]))
+        self.assertEqual(self.serialize()["likes_count"], 1)
+
+
+class BatchInteractionTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="grace", password="pass12345")
+        self.other = User.objects.create_user(username="heidi", password="pass12345")
+        self.client.force_authenticate(self.user)
+
+    def make_posts(self, count):
+        return [Post.objects.create(author=self.other, title=f"Batch post {i}", content="Body") for i in range(count)]
+
+    def run_batch(self, operations):
+        return self.client.post(reverse("batch-interactions"), {"operations": operations}, format="json")
+
+    def test_applies_operations_and_reports_per_item(self):
+        liked, unliked, commented = self.make_posts(3)
+        Like.objects.create(user=self.user, post=unliked)
+        Post.objects.filter(pk=unliked.pk).update(likes_count=1)
+        hidden = Post.objects.create(author=self.other, title="Hidden post", content="Body", privacy="private")
+
+        response = self.run_batch([
+            {"op": "like", "post": liked.id},
+            {"op": "like", "post": liked.id},
+            {"op": "unlike", "post": unliked.id},
+            {"op": "comment", "post": commented.id, "comment": "Batched"},
+            {"op": "comment", "post": commented.id, "comment": ""},
+            {"op": "like", "post": hidden.id},
+        ])
+
+        statuses = [item["status"] for item in response.data["results"]]
+        self.assertEqual(statuses, ["ok", "ok", "ok", "ok", "error", "error"])
+        counts = dict(Post.objects.values_list("pk", "likes_count"))
+        self.assertEqual((counts[liked.pk], counts[unliked.pk]), (1, 0))
+        self.assertEqual(Post.objects.get(pk=commented.pk).comments_count, 1)
+        self.assertFalse(Like.objects.filter(post=hidden).exists())
+
+    def test_query_count_is_independent_of_batch_size(self):
+        def count_queries(posts):
+            operations = [{"op": "like", "post": post.id} for post in posts]
+            operations += [{"op": "comment", "post": post.id, "comment": "Hi"} for post in posts]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.run_batch(operations).status_code, 200)
+            return len(queries)
+
+        self.assertEqual(count_queries(self.make_posts(2)), count_queries(self.make_posts(20)))
+
+    def test_counters_skip_likes_another_request_wrote_first(self):
+        raced, fresh = self.make_posts(2)
+        bulk_create = Like.objects.bulk_create
+
+        def like_concurrently(likes, **kwargs):
+            # Another request likes and counts the post between the lookup and the insert.
+            Like.objects.create(user=self.user, post=raced)
+            Post.objects.filter(pk=raced.pk).update(likes_count=1)
+            return bulk_create(likes, **kwargs)
+
+        with mock.patch.object(Like.objects, "bulk_create", side_effect=like_concurrently):
+            self.run_batch([{"op": "like", "post": raced.id}, {"op": "like", "post": fresh.id}])
+        counts = dict(Post.objects.values_list("pk", "likes_count"))
+        self.assertEqual((counts[raced.pk], counts[fresh.pk]), (1, 1))
+
+
+class RequestMetricsTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.user = User.objects.create_user(username="ivan", password="pass12345")
+        Post.objects.create(author=self.user, title="Measured post", content="Body")
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_reports_queries_and_cache(self):
+        first = self.client.get(reverse("news-feed"))
+        second = self.client.get(reverse("news-feed"))
+
+        self.assertRegex(first["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('cache;desc="hit=0 miss=2"', first["Server-Timing"])
+        self.assertIn('desc="0 queries"', second["Server-Timing"])
+        self.assertIn('cache;desc="hit=1 miss=0"', second["Server-Timing"])
+
+    def test_metrics_endpoint_exposes_prometheus_text(self):
+        self.client.get(reverse("news-feed"))
+        # A local address proves nothing behind a reverse proxy; only staff may scrape.
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1").status_code, 403)
+
+        self.client.force_authenticate(User.objects.create_user(username="ivy", password="pass12345", is_staff=True))
+        body = self.client.get(reverse("metrics")).content.decode()
+
+        self.assertIn('connectly_requests_total{view="news-feed",method="GET",status="200"} 1', body)
+        self.assertIn("# TYPE connectly_request_duration_seconds histogram", body)
+
+
+class AsyncViewTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="judy", password="pass12345")
+        self.auth = {"Authorization": f"Token {Token.objects.create(user=self.user).key}"}
+        self.post = Post.objects.create(author=self.user, title="Async post", content="Body")
+        self.async_client = AsyncClient()
+
+    async def test_like_comment_and_read_back(self):
+        await self.async_client.post(reverse("async-like-post", args=[self.post.id]), headers=self.auth)
+        await self.async_client.post(
+            reverse("async-comment-post", args=[self.post.id]), {"comment": "From the event loop"},
+            content_type="application/json", headers=self.auth,
+        )
+
+        feed = (await self.async_client.get(reverse("async-news-feed"), headers=self.auth)).json()
+        self.assertEqual(feed["results"][0]["likes_count"], 1)
+        self.assertEqual(feed["results"][0]["comments_count"], 1)
+
+        comments = await self.async_client.get(reverse("async-post-comments", args=[self.post.id]), headers=self.auth)
+        self.assertEqual([c["content"] for c in comments.json()["results"]], ["From the event loop"])
+
+    async def test_rejects_missing_token(self):
+        response = await self.async_client.get(reverse("async-news-feed"))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_other_users_private_posts_are_not_found(self):
+        owner = await User.objects.acreate_user(username="kyle", password="pass12345")
+        hidden = await Post.objects.acreate(author=owner, title="Hidden post", content="Body", privacy="private")
+        for name, body in (("async-like-post", {}), ("async-comment-post", {"comment": "Peek"})):
+            response = await self.async_client.post(
+                reverse(name, args=[hidden.id]), body, content_type="application/json", headers=self.auth,
+            )
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(await Comment.objects.filter(post=hidden).aexists())
+
+
+class CachedTokenAuthenticationTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.user = User.objects.create_user(username="kate", password="pass12345")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("news-feed"))
+        return response, sum('"authtoken_token"' in q["sql"] for q in queries.captured_queries)
+
+    def test_repeat_requests_skip_token_lookup(self):
+        self.assertEqual(self.token_queries()[1], 1)
+        response, lookups = self.token_queries()
+        self.assertEqual((response.status_code, lookups), (200, 0))
+
+    def test_logout_and_rotation_invalidate_cache(self):
+        self.token_queries()
+        self.token.delete()
+        self.assertEqual(self.token_queries()[0].status_code, 401)
+
+        rotated = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {rotated.key}")
+        self.assertEqual(self.token_queries()[0].status_code, 200)
+
+    def test_revocation_reaches_other_workers(self):
+        worker = TokenCache(cache_alias=token_cache.cache_alias)
+        worker.set(Token.objects.select_related("user__profile").get(key=self.token.key), time.time())
+        self.assertIsNotNone(worker.get(self.token.key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNone(worker.get(self.token.key))
+
+        worker.set(Token.objects.select_related("user__profile").get(key=self.token.key), time.time())
+        self.assertIsNotNone(worker.get(self.token.key))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertIsNone(worker.get(self.token.key))
+
+    def test_hits_return_copies(self):
+        self.token_queries()
+        first, second = token_cache.get(self.token.key), token_cache.get(self.token.key)
+        self.assertIsNot(first.user, second.user)
+        self.assertIsNot(first.user.profile, second.user.profile)
+        first.user.first_name = "Changed"
+        self.assertEqual(token_cache.get(self.token.key).user.first_name, "")
+
+
+class UserProfileProvisioningTests(ConnectlyTestCase):
+    def test_registration_creates_profile_with_one_insert(self):
+        with self.assertNumQueries(2):
+            user = User.objects.create_user(username="leo", password="pass12345")
+        self.assertEqual(UserProfile.objects.get(user=user).role, "user")
+
+    def test_login_updates_last_login_only(self):
+        user = User.objects.create_user(username="mia", password="pass12345")
+        with self.assertNumQueries(1):
+            update_last_login(None, user)
+
+    def test_bulk_import_provisions_profiles(self):
+        users = UserFactory.bulk_create_users([User(username=f"import_{i}") for i in range(5)])
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 5)
+
+
+class PostExportTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(username="nina", password="pass12345")
+        self.old = Post.objects.create(author=self.admin, title="Old post", content="Body")
+        self.client.force_authenticate(self.admin)
+
+    def export(self, **params):
+        response = self.client.get(reverse("post-export"), params)
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_streams_posts_with_comments(self):
+        comment_on_post(self.admin, self.old, "Exported comment")
+        records = self.export()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["comments_count"], 1)
+        self.assertEqual(records[0]["comments"][0]["content"], "Exported comment")
+
+    def test_since_watermark_includes_edits_and_new_comments(self):
+        watermark = self.export()[-1]["changed_at"]
+        self.assertEqual(self.export(since=watermark), [])
+
+        new = Post.objects.create(author=self.admin, title="New post", content="Body")
+        comment_on_post(self.admin, self.old, "Late comment")
+        self.assertEqual({r["id"] for r in self.export(since=watermark)}, {self.old.id, new.id})
+
+    def test_since_watermark_includes_comment_edits(self):
+        comment = comment_on_post(self.admin, self.old, "First draft")
+        watermark = self.export()[-1]["changed_at"]
+        comment.content = "Edited"
+        comment.save()
+        records = self.export(since=watermark)
+        self.assertEqual([r["id"] for r in records], [self.old.id])
+        self.assertEqual(records[0]["changed_at"], comment.updated_at.isoformat())
+
+    def test_comments_beyond_the_first_page_are_streamed(self):
+        comments = [comment_on_post(self.admin, self.old, f"Comment {n}") for n in range(5)]
+        quiet = Post.objects.create(author=self.admin, title="No comments", content="Body")
+        with mock.patch.object(export, "COMMENT_PAGE_SIZE", 2):
+            records = self.export()
+        self.assertEqual([record["id"] for record in records], [self.old.id, quiet.id])
+        self.assertEqual([c["id"] for c in records[0]["comments"]], [c.id for c in comments])
+        self.assertEqual(records[0]["changed_at"], comments[-1].updated_at.isoformat())
+        self.assertEqual(records[1]["comments"], [])
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(User.objects.create_user(username="omar", password="pass12345"))
+        self.assertEqual(self.client.get(reverse("post-export")).status_code, 403)
+
+
+class PostSearchTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="pia", password="pass12345")
+        self.other = User.objects.create_user(username="quin", password="pass12345")
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        response = self.client.get(reverse("post-search"), {"q": text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.data["results"]], response.data["next"]
+
+    def test_title_match_ranks_above_content_match(self):
+        body = Post.objects.create(author=self.other, title="Weekend", content="Notes on gardening tools")
+        title = Post.objects.create(author=self.other, title="Gardening", content="Weekend notes")
+        self.assertEqual(self.search("gardening")[0], [title.id, body.id])
+
+    def test_respects_privacy(self):
+        mine = Post.objects.create(author=self.user, title="Secret recipe", content="x", privacy="private")
+        Post.objects.create(author=self.other, title="Secret plans", content="x", privacy="private")
+        public = Post.objects.create(author=self.other, title="Secret garden", content="x")
+        self.assertCountEqual(self.search("secret")[0], [mine.id, public.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        post = Post.objects.create(author=self.user, title="Draft", content="Initial words")
+        post.content = "Revised words"
+        post.save()
+        self.assertEqual(self.search("initial")[0], [])
+        self.assertEqual(self.search("revised")[0], [post.id])
+        post.delete()
+        self.assertEqual(self.search("revised")[0], [])
+
+    def test_cursor_pages_cover_every_hit_once(self):
+        posts = {Post.objects.create(author=self.other, title=f"Travel log {i}", content="x" * i).id
+                 for i in range(1, 6)}
+        seen = []
+        ids, next_link = self.search("travel", page_size=2)
+        seen.extend(ids)
+        while next_link:
+            response = self.client.get(next_link)
+            seen.extend(item["id"] for item in response.data["results"])
+            next_link = response.data["next"]
+        self.assertEqual(sorted(seen), sorted(posts))
+
+    def test_query_syntax_is_not_interpreted(self):
+        Post.objects.create(author=self.other, title="Quoted", content="x")
+        self.assertEqual(self.search('quoted" OR (NEAR')[0], [])
+        self.assertEqual(self.client.get(reverse("post-search"), {"q": "  "}).status_code, 400)
+
+    def test_rebuild_indexes_bulk_created_posts(self):
+        Post.objects.bulk_create([Post(author=self.other, title="Imported archive", content="x")])
+        self.assertEqual(self.search("archive")[0], [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(len(self.search("archive")[0]), 1)
+
+
+class PostVisibilityTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(username="rosa", password="pass12345")
+        self.other = User.objects.create_user(username="sam", password="pass12345")
+        self.public = PostFactory.create_post(self.other, "Public news", "Body")
+        self.mine = PostFactory.create_post(self.owner, "My private notes", "Body", privacy="private")
+        self.theirs = PostFactory.create_post(self.other, "Their private notes", "Body", privacy="private")
+        self.client.force_authenticate(self.owner)
+
+    def test_visible_to(self):
+        self.assertCountEqual(Post.objects.visible_to(self.owner), [self.public, self.mine])
+        self.assertCountEqual(Post.objects.visible_to(None), [self.public])
+
+    def test_feed_mixes_own_private_posts_in_one_query(self):
+        warm_global_timeline()
+        warm_private_timeline(self.owner)
+        for params in ({}, {"cursor": ""}):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("news-feed"), params)
+            self.assertEqual([item["id"] for item in response.data["results"]], [self.mine.id, self.public.id])
+            post_selects = [q for q in queries.captured_queries if 'FROM "posts_post"' in q["sql"]
+                            and not q["sql"].startswith("SELECT COUNT(*)")]
+            self.assertEqual(len(post_selects), 1)
+
+    def test_interactions_on_hidden_posts_are_not_found(self):
+        for name in ("like-post", "comment-post"):
+            self.assertEqual(self.client.post(reverse(name, args=[self.theirs.id]), {"comment": "Hi"}).status_code, 404)
+        comment_on_post(self.other, self.theirs, "Hidden")
+        self.assertEqual(self.client.get(reverse("post-comments", args=[self.theirs.id])).data["results"], [])
+        self.client.post(reverse("like-post", args=[self.mine.id]))
+        self.assertTrue(Like.objects.filter(user=self.owner, post=self.mine).exists())
+
+    def test_serializers_only_resolve_visible_posts(self):
+        request = type("Request", (), {"user": self.owner})()
+        hidden = CommentSerializer(data={"post": self.theirs.id, "content": "Hi"}, context={"request": request})
+        self.assertFalse(hidden.is_valid())
+        self.assertEqual(hidden.errors["post"], ["Post not found."])
+        self.assertTrue(LikeSerializer(data={"post": self.mine.id}, context={"request": request}).is_valid())
+
+
+@override_settings(LIKE_INGESTION={"MODE": "buffered", "MAX_BATCH": 500, "FLUSH_INTERVAL": None})
+class LikeBufferTests(ConnectlyTestCase):
+    def setUp(self):
+        super().setUp()
+        likebuffer.reset_like_buffer()
+        self.addCleanup(likebuffer.reset_like_buffer)
+        self.user = User.objects.create_user(username="tara", password="pass12345")
+        self.post = Post.objects.create(author=self.user, title="Viral post", content="Body")
+        self.client.force_authenticate(self.user)
+
+    def like_count(self):
+        return [item["likes_count"] for item in self.client.get(reverse("post-list")).data["results"]]
+
+    def test_taps_are_coalesced_and_flushed_in_one_transaction(self):
+        for name in ("like-post", "unlike-post", "like-post", "like-post"):
+            self.client.post(reverse(name, args=[self.post.id]))
+        self.assertFalse(Like.objects.exists())
+
+        fans = [User.objects.create_user(username=f"fan{i}", password="pass12345") for i in range(5)]
+        buffer = likebuffer.get_like_buffer()
+        for fan in fans:
+            buffer.record(fan.pk, self.post.pk, True)
+        # Savepoint, existing likes, live posts, one INSERT, one UPDATE, release.
+        with self.assertNumQueries(6):
+            self.assertEqual(buffer.flush(), 6)
+
+        self.post.refresh_from_db()
+        self.assertEqual((Like.objects.count(), self.post.likes_count), (6, 6))
+
+    def test_batch_likes_go_through_the_buffer(self):
+        operations = [{"op": "like", "post": self.post.id}]
+        self.client.post(reverse("batch-interactions"), {"operations": operations}, format="json")
+        self.assertFalse(Like.objects.exists())
+
+        likebuffer.get_like_buffer().flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_acting_user_reads_their_own_buffered_likes(self):
+        self.client.get(reverse("news-feed"))
+        self.client.post(reverse("like-post", args=[self.post.id]))
+        self.assertEqual(self.like_count(), [1])
+        self.assertEqual(self.client.get(reverse("news-feed")).data["results"][0]["likes_count"], 1)
+
+        likebuffer.get_like_buffer().flush()
+        self.assertEqual(self.like_count(), [1])
+        self.client.post(reverse("unlike-post", args=[self.post.id]))
+        self.assertEqual(self.like_count(), [0])
+
+    def test_failed_flush_keeps_events_without_overwriting_newer_ones(self):
+        buffer = likebuffer.get_like_buffer()
+        buffer.record(self.user.pk, self.post.pk, True)
+        with mock.patch("posts.likebuffer.transaction.atomic", side_effect=OperationalError("database is locked")):
+            with self.assertRaises(OperationalError):
+                buffer.flush()
+        self.assertEqual(buffer.pending_deltas(self.user.pk, [self.post.pk]), {self.post.pk: 1})
+
+        buffer.shutdown()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertFalse(buffer.has_pending(self.user.pk))
+
+    def test_reset_removes_the_exit_flush(self):
+        buffer = likebuffer.get_like_buffer()
+        buffer.record(self.user.pk, self.post.pk, True)
+        with mock.patch.object(likebuffer.atexit, "unregister") as unregister:
+            likebuffer.reset_like_buffer()
+        unregister.assert_called_once_with(buffer.shutdown)
+        likebuffer.atexit.unregister(buffer.shutdown)
+        self.assertIsNone(likebuffer._buffer)
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+
+
+class SeedingTests(ConnectlyTestCase):
+    def test_seeded_rows_match_their_counters(self):
+        users = seeding.seed_users(3)
+        self.assertEqual(len(seeding.seed_tokens(users)), 3)
+        created = seeding.seed_posts(users, 4, likes_per_post=1, comments_per_post=1, batch_size=3)
+
+        self.assertEqual(created["posts"], Post.objects.count())
+        self.assertEqual(created["likes"], Like.objects.count())
+        self.assertEqual(created["comments"], Comment.objects.count())
+        self.assertEqual(Post.objects.count(), 4)
+        for post in Post.objects.with_counts():
+            self.assertEqual((post.likes_count, post.comments_count), (post.num_likes, post.num_comments))
+        self.assertEqual(sum(UserProfile.objects.values_list("posts_count", flat=True)), 4)
+        self.assertEqual(len(seeding.seed_users(3)), 3)  # tops up, never duplicates
+
+    def test_benchmarks_refuse_the_development_database(self):
+        development = settings.BASE_DIR / "db.sqlite3"
+        with mock.patch.dict(connection.settings_dict, {"NAME": development}):
+            with self.assertRaisesMessage(CommandError, "CONNECTLY_DB_PATH"):
+                call_command("loadtest", requests=1)
+        self.assertFalse(User.objects.exists())
+
+
+class SQLiteTuningTests(ConnectlyTestCase):
+    def open_connection(self):
+        """A fresh connection, so the connection_created hook runs outside the test transaction."""
+        fresh = connections.create_connection(DEFAULT_DB_ALIAS)
+        self.addCleanup(fresh.close)
+        fresh.ensure_connection()
+        with fresh.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            return cursor.fetchone()[0]
+
+    def test_connection_hook_applies_profile_pragmas(self):
+        # The checked-in database keeps SQLite's defaults unless a deployment opts in.
+        self.assertEqual(settings.SQLITE_PROFILE, "baseline")
+        self.assertEqual(self.open_connection(), 2)  # FULL
+        with override_settings(SQLITE_PROFILE="tuned"):
+            self.assertEqual(self.open_connection(), 1)  # NORMAL
+
+
+@override_settings(DATABASE_REPLICAS=["replica_a", "replica_b"])
+class ReplicaRouterTests(APITransactionTestCase):
+    """Runs outside TestCase's wrapping transaction, which keeps every read on the primary."""
+
+    def setUp(self):
+        cache.clear()
+        self.router = routers.PrimaryReplicaRouter()
+        self.user = User.objects.create_user(username="uma", password="pass12345")
+        self.factory = RequestFactory()
+
+    def read_alias(self, method="get", user=None, model=Post):
+        request = getattr(self.factory, method)("/api/feed/")
+        request.user = user or self.user
+        token = routers.start_request(request)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            routers.end_request(token)
+
+    def test_safe_reads_spread_across_replicas(self):
+        self.assertEqual({self.read_alias() for _ in range(100)}, {"replica_a", "replica_b"})
+        self.assertEqual(self.router.db_for_read(Post), "default")
+
+    def test_writes_transactions_and_credentials_use_primary(self):
+        self.assertEqual(self.read_alias("post"), "default")
+        self.assertEqual(self.read_alias(model=Token), "default")
+        with transaction.atomic():
+            self.assertEqual(self.read_alias(), "default")
+        self.assertEqual(self.router.db_for_write(Post), "default")
+
+    def test_successful_write_pins_user_to_primary(self):
+        post = Post.objects.create(author=self.user, title="Pinned post", content="Body")
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse("like-post", args=[post.id]))
+        self.assertEqual(self.read_alias(), "default")
+
+        cache.delete(routers.pin_key(self.user.pk))
+        self.assertIn(self.read_alias(), {"replica_a", "replica_b"})
+
+    def test_recent_feed_change_keeps_replica_pages_out_of_cache(self):
+        request = self.factory.get("/api/feed/")
+        request.user = self.user
+        token = routers.start_request(request)
+        try:
+            self.assertFalse(routers.replica_read_may_be_stale())
+            bump_feed_version()
+            self.assertTrue(routers.replica_read_may_be_stale())
+        finally:
+            routers.end_request(token)
+
+
+class TwoTierCacheTests(ConnectlyTestCase):
+    """Two TwoTierCache instances over one LocMemCache stand in for two workers."""
+
+    def setUp(self):
+        super().setUp()
+        self.shared = LocMemCache("two-tier-tests", {})
+        self.shared.clear()
+        self.worker_a = self.make_worker()
+        self.worker_b = self.make_worker()
+
+    def make_worker(self, **options):
+        worker = TwoTierCache(None, {"OPTIONS": {"SYNC_INTERVAL": 0, **options}})
+        worker.shared = self.shared
+        return worker
+
+    def test_suite_runs_on_in_memory_caches(self):
+        for alias in ("default", "shared"):
+            self.assertIsInstance(caches[alias], LocMemCache)
+
+    def test_file_based_shared_tier_is_not_atomic(self):
+        worker = self.make_worker()
+        self.assertTrue(worker.atomic)
+        with tempfile.TemporaryDirectory() as directory:
+            worker.shared = FileBasedCache(directory, {})
+            self.assertFalse(worker.atomic)
+
+    def test_without_atomic_cache_feed_versions_come_from_the_clock(self):
+        default = caches["default"]
+        with mock.patch.object(default, "atomic", False, create=True), \
+                mock.patch.object(default, "add", wraps=default.add) as add:
+            self.assertEqual(get_or_build("built", lambda: ("value", True), 60), "value")
+            versions = [bump_feed_version() for _ in range(3)]
+        add.assert_not_called()  # no lease
+        self.assertEqual(len(set(versions)), 3)
+        self.assertEqual(get_feed_version(), versions[-1])
+
+    def test_local_tier_is_a_bounded_lru(self):
+        worker = self.make_worker(LOCAL_MAX_ENTRIES=2)
+        worker.set_many({"a": 1, "b": 2})
+        worker.get("a")
+        worker.set("c", 3)
+        self.assertEqual(list(worker._local), [worker.make_key("a"), worker.make_key("c")])
+        self.assertEqual(worker.get("b"), 2)  # evicted locally, still shared
+
+    def test_writes_and_deletes_are_broadcast_to_other_workers(self):
+        self.worker_a.set("feed:page", "old")
+        self.assertEqual(self.worker_b.get("feed:page"), "old")
+
+        self.worker_a.set("feed:page", "new")
+        self.assertEqual(self.worker_b.get("feed:page"), "new")
+        self.worker_a.set("counter", 1)
+        self.assertEqual(self.worker_b.get("counter"), 1)
+        self.worker_a.incr("counter")
+        self.assertEqual(self.worker_b.get("counter"), 2)
+        self.worker_a.delete("feed:page")
+        self.assertIsNone(self.worker_b.get("feed:page"))
+
+    def test_worker_too_far_behind_drops_its_local_tier(self):
+        worker = self.make_worker(LOG_SIZE=2)
+        worker.set("key", "old")
+        worker.sync(force=True)
+        for value in range(3):
+            self.worker_a.set(f"other:{value}", value)
+        self.shared.set("key", "new")
+        self.assertEqual(worker.get("key"), "new")
+
+    def test_concurrent_misses_build_once(self):
+        builds = []
+        started = threading.Barrier(8)
+
+        def build():
+            builds.append(1)
+            time.sleep(0.05)
+            return {"results": []}, True
+
+        def request():
+            started.wait()
+            results.append(get_or_build("feed:stampede", build, timeout=60))
+
+        results = []
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [{"results": []}] * 8)
+
+    def test_waiter_uses_value_built_under_another_workers_lease(self):
+        cache.add(lease_key("feed:leased"), True, timeout=10)
+        threading.Timer(0.1, cache.set, args=("feed:leased", "built elsewhere")).start()
+        value = get_or_build("feed:leased", lambda: self.fail("built twice"), timeout=60)
+        self.assertEqual(value, "built elsewhere")
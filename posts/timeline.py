@@ -0,0 +1,312 @@
+import bisect
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+GLOBAL_TIMELINE = "global"
+DEFAULT_MAX_LENGTH = 1000
+
+
+def private_timeline(user_id):
+    """An author's private posts, merged into their own feed."""
+    return f"private:{user_id}"
+
+
+def post_score(post):
+    return post.created_at.timestamp()
+
+
+class BaseTimelineBackend:
+    """Bounded timelines of post IDs, newest first, keyed by timeline name.
+
+    A timeline holds at most ``max_length`` IDs; ``total`` is the number it holds.
+    Once older IDs have been dropped to respect the bound the timeline is
+    truncated: it still holds every post newer than its oldest entry, and pushes
+    of older posts are ignored so no gap opens up, but counting all of its posts
+    takes a database query.
+
+    Backends whose timelines every worker sees set ``shared``; the news feed only
+    serves pages from shared timelines.
+    """
+    shared = False
+
+    def __init__(self, max_length=DEFAULT_MAX_LENGTH, **options):
+        self.max_length = max_length
+
+    def push(self, key, post_id, score):
+        raise NotImplementedError
+
+    def remove(self, key, post_id):
+        raise NotImplementedError
+
+    def range(self, key, offset, limit):
+        """Returns up to ``limit`` post IDs starting ``offset`` entries from the newest."""
+        raise NotImplementedError
+
+    def total(self, key):
+        raise NotImplementedError
+
+    def is_truncated(self, key):
+        raise NotImplementedError
+
+    def is_warm(self, key):
+        raise NotImplementedError
+
+    def load(self, key, entries, truncated=False):
+        """Merges (post_id, score) pairs into a timeline and marks it warm.
+
+        Entries pushed before the load are kept. The timeline is truncated if
+        ``truncated`` is set or the merge went past the bound.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryTimelineBackend(BaseTimelineBackend):
+    """Per-process timelines kept as sorted lists; suitable for a single worker and tests."""
+
+    def __init__(self, max_length=DEFAULT_MAX_LENGTH, **options):
+        super().__init__(max_length, **options)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._scores = {}
+            self._truncated = set()
+            self._warm = set()
+
+    def push(self, key, post_id, score):
+        with self._lock:
+            scores = self._scores.setdefault(key, {})
+            entries = self._entries.setdefault(key, [])
+            if post_id in scores:
+                return False
+            if key in self._truncated and entries and (score, post_id) < entries[0]:
+                return False
+            scores[post_id] = score
+            bisect.insort(entries, (score, post_id))
+            while len(entries) > self.max_length:
+                _, evicted = entries.pop(0)
+                del scores[evicted]
+                self._truncated.add(key)
+            return post_id in scores
+
+    def remove(self, key, post_id):
+        with self._lock:
+            score = self._scores.get(key, {}).pop(post_id, None)
+            if score is None:
+                return False
+            self._entries[key].remove((score, post_id))
+            return True
+
+    def range(self, key, offset, limit):
+        with self._lock:
+            entries = self._entries.get(key, [])
+            end = len(entries) - offset
+            start = max(end - limit, 0)
+            return [post_id for _, post_id in reversed(entries[start:max(end, 0)])]
+
+    def total(self, key):
+        return len(self._entries.get(key, ()))
+
+    def is_truncated(self, key):
+        return key in self._truncated
+
+    def is_warm(self, key):
+        return key in self._warm
+
+    def load(self, key, entries, truncated=False):
+        with self._lock:
+            scores = {**self._scores.get(key, {}), **dict(entries)}
+            entries = sorted((score, post_id) for post_id, score in scores.items())
+            truncated = truncated or len(entries) > self.max_length
+            entries = entries[-self.max_length:]
+            self._entries[key] = entries
+            self._scores[key] = {post_id: score for score, post_id in entries}
+            if truncated:
+                self._truncated.add(key)
+            else:
+                self._truncated.discard(key)
+            self._warm.add(key)
+
+
+# Pushes skip posts older than a truncated timeline's oldest entry, trim it to
+# the bound and report whether the post stayed, in one atomic step.
+_PUSH_SCRIPT = """
+if redis.call("EXISTS", KEYS[2]) == 1 then
+    local oldest = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+    if oldest[2] and tonumber(ARGV[2]) < tonumber(oldest[2]) then
+        return 0
+    end
+end
+local added = redis.call("ZADD", KEYS[1], ARGV[2], ARGV[1])
+if redis.call("ZREMRANGEBYRANK", KEYS[1], 0, -(tonumber(ARGV[3]) + 1)) > 0 then
+    redis.call("SET", KEYS[2], 1)
+    if not redis.call("ZSCORE", KEYS[1], ARGV[1]) then
+        return 0
+    end
+end
+return added
+"""
+
+# Loads merge into whatever pushes already added, so a post published while the
+# timeline was warming is kept.
+_LOAD_SCRIPT = """
+for i = 3, #ARGV, 2 do
+    redis.call("ZADD", KEYS[1], ARGV[i + 1], ARGV[i])
+end
+if redis.call("ZREMRANGEBYRANK", KEYS[1], 0, -(tonumber(ARGV[1]) + 1)) > 0 or ARGV[2] == "1" then
+    redis.call("SET", KEYS[2], 1)
+else
+    redis.call("DEL", KEYS[2])
+end
+redis.call("SET", KEYS[3], 1)
+"""
+
+
+class RedisTimelineBackend(BaseTimelineBackend):
+    """Timelines stored as Redis sorted sets, shared by every worker.
+
+    ``client`` may be any object with the redis-py sorted-set and scripting API;
+    when omitted a client is created from ``url``.
+    """
+    shared = True
+
+    def __init__(self, max_length=DEFAULT_MAX_LENGTH, client=None, url="redis://localhost:6379/0",
+                 prefix="timeline:", **options):
+        super().__init__(max_length, **options)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._push = client.register_script(_PUSH_SCRIPT)
+        self._load = client.register_script(_LOAD_SCRIPT)
+
+    def _key(self, key, suffix=""):
+        return f"{self.prefix}{key}{suffix}"
+
+    def push(self, key, post_id, score):
+        keys = [self._key(key), self._key(key, ":truncated")]
+        return bool(self._push(keys=keys, args=[post_id, score, self.max_length]))
+
+    def remove(self, key, post_id):
+        return bool(self.client.zrem(self._key(key), post_id))
+
+    def range(self, key, offset, limit):
+        if limit <= 0:
+            return []
+        members = self.client.zrevrange(self._key(key), offset, offset + limit - 1)
+        return [int(member) for member in members]
+
+    def total(self, key):
+        return self.client.zcard(self._key(key))
+
+    def is_truncated(self, key):
+        return bool(self.client.exists(self._key(key, ":truncated")))
+
+    def is_warm(self, key):
+        return bool(self.client.exists(self._key(key, ":warm")))
+
+    def load(self, key, entries, truncated=False):
+        entries = sorted(entries, key=lambda entry: entry[1])
+        truncated = truncated or len(entries) > self.max_length
+        args = [self.max_length, int(truncated)]
+        for post_id, score in entries[-self.max_length:]:
+            args += [post_id, score]
+        self._load(keys=[self._key(key), self._key(key, ":truncated"), self._key(key, ":warm")], args=args)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_timeline_backend():
+    """Returns the process-wide backend configured by ``settings.TIMELINE``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, "TIMELINE", {})
+                backend_class = import_string(config.get("BACKEND", "posts.timeline.InMemoryTimelineBackend"))
+                _backend = backend_class(
+                    max_length=config.get("MAX_LENGTH", DEFAULT_MAX_LENGTH),
+                    **config.get("OPTIONS", {}),
+                )
+    return _backend
+
+
+def shared_timeline_backend():
+    """The configured backend if every worker shares it, else None.
+
+    The feed only reads shared timelines, so writes skip per-process ones.
+    """
+    backend = get_timeline_backend()
+    return backend if backend.shared else None
+
+
+def fan_out_post(post):
+    """Pushes a new post into the global timeline or its author's private one."""
+    backend = shared_timeline_backend()
+    if backend is None:
+        return
+    key = GLOBAL_TIMELINE if post.privacy == "public" else private_timeline(post.author_id)
+    backend.push(key, post.pk, post_score(post))
+
+
+def sync_post(post):
+    """Moves a post between the global and its author's private timeline to match its privacy."""
+    backend = shared_timeline_backend()
+    if backend is None:
+        return
+    if post.privacy == "public":
+        backend.push(GLOBAL_TIMELINE, post.pk, post_score(post))
+        backend.remove(private_timeline(post.author_id), post.pk)
+    else:
+        backend.remove(GLOBAL_TIMELINE, post.pk)
+        backend.push(private_timeline(post.author_id), post.pk, post_score(post))
+
+
+def remove_post(post_id, author_id):
+    backend = shared_timeline_backend()
+    if backend is None:
+        return
+    backend.remove(private_timeline(author_id), post_id)
+    backend.remove(GLOBAL_TIMELINE, post_id)
+
+
+def warm_global_timeline():
+    """Loads the newest public posts into a cold global timeline with one query."""
+    from .models import Post
+
+    backend = get_timeline_backend()
+    if backend.is_warm(GLOBAL_TIMELINE):
+        return backend
+    public = Post.objects.filter(privacy="public")
+    # One row past the bound tells whether older posts were left out.
+    latest = public.order_by("-created_at", "-id").values_list("pk", "created_at")[:backend.max_length + 1]
+    backend.load(GLOBAL_TIMELINE, [(pk, created_at.timestamp()) for pk, created_at in latest])
+    return backend
+
+
+def warm_private_timeline(user):
+    """Loads a cold private timeline for ``user`` with one query and returns its key."""
+    from .models import Post
+
+    backend = get_timeline_backend()
+    key = private_timeline(user.pk)
+    if not backend.is_warm(key):
+        private = Post.objects.filter(author_id=user.pk, privacy="private")
+        rows = private.order_by("-created_at", "-id").values_list("pk", "created_at")[:backend.max_length + 1]
+        backend.load(key, [(pk, created_at.timestamp()) for pk, created_at in rows])
+    return key
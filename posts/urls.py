@@ -1,17 +1,22 @@
 from django.urls import path, include
 from posts.views import GoogleLogin  
 from .views import NewsFeedView
+from .async_views import AsyncNewsFeedView, AsyncLikePostView, AsyncCommentPostView, AsyncPostCommentsView
 from .views import (
     PostListCreateView,
     PostRetrieveUpdateDeleteView,
     LikePostView,
     UnlikePostView,
     CommentPostView,
+    BatchInteractionView,
     PostCommentsView,
     SingletonConfigView,
     NewsFeedView,
     UserRoleView,         
-    PostPrivacyUpdateView  
+    PostPrivacyUpdateView,
+    PostExportView,
+    PostSearchView,
+    MetricsView,
 )
 
 urlpatterns = [
@@ -21,10 +26,18 @@ urlpatterns = [
     path("posts/<int:post_id>/unlike/", UnlikePostView.as_view(), name="unlike-post"),
     path("posts/<int:post_id>/comment/", CommentPostView.as_view(), name="comment-post"),
     path("posts/<int:post_id>/comments/", PostCommentsView.as_view(), name="post-comments"),
+    path("posts/batch/", BatchInteractionView.as_view(), name="batch-interactions"),
+    path("posts/export/", PostExportView.as_view(), name="post-export"),
+    path("posts/search/", PostSearchView.as_view(), name="post-search"),
     path("singleton/", SingletonConfigView.as_view(), name="singleton"),
     path("feed/", NewsFeedView.as_view(), name="news-feed"),
     path("user/role/", UserRoleView.as_view(), name="user-role"), 
     path("posts/<int:post_id>/privacy/", PostPrivacyUpdateView.as_view(), name="post-privacy"),  
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    path("async/feed/", AsyncNewsFeedView.as_view(), name="async-news-feed"),
+    path("async/posts/<int:post_id>/like/", AsyncLikePostView.as_view(), name="async-like-post"),
+    path("async/posts/<int:post_id>/comment/", AsyncCommentPostView.as_view(), name="async-comment-post"),
+    path("async/posts/<int:post_id>/comments/", AsyncPostCommentsView.as_view(), name="async-post-comments"),
     path("auth/google/login/", GoogleLogin.as_view(), name="google-login"),  
     path("auth/", include("dj_rest_auth.urls")),
     path("auth/registration/", include("dj_rest_auth.registration.urls")),
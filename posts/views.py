@@ -1,9 +1,15 @@
+from datetime import datetime, timezone
+
 from google.oauth2 import id_token
 from google.auth.transport import requests
-from django.core.cache import cache
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
 from django.shortcuts import get_object_or_404
-from django.db.models import Prefetch
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
 from rest_framework import generics, permissions, viewsets
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
@@ -13,47 +19,159 @@ from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
 from dj_rest_auth.registration.views import SocialLoginView
 from allauth.socialaccount.providers.oauth2.client import OAuth2Client
 from .models import Post, Like, Comment
-from .serializers import PostSerializer, LikeSerializer, CommentSerializer
-from .factories import PostFactory
-from .singleton import PostConfigManager  
-from rest_framework.pagination import PageNumberPagination
+from .serializers import (
+    PostSerializer, FeedPostSerializer, LikeSerializer, CommentSerializer, BatchOperationSerializer,
+)
+from .conditional import (
+    ConditionalGetMixin, ConditionalUpdateMixin, check_preconditions, post_validators, set_validators,
+)
+from .export import iter_ndjson
+from .fieldsets import FieldSelection
+from .factories import PostFactory, PostQuotaExceeded
+from .interactions import counter_delta_case, ingest_like, comment_on_post
+from .likebuffer import apply_pending_likes, get_like_buffer, has_pending_likes
+from .singleton import PostConfigManager
+from .cache import (
+    FEED_CACHE_TIMEOUT, bump_feed_version, feed_cache_key, feed_changed_at, get_feed_version, get_or_build,
+    serialize_posts, invalidate_post_fragment, invalidate_post_fragments,
+)
+from .timeline import GLOBAL_TIMELINE, get_timeline_backend, warm_global_timeline, warm_private_timeline
+from .metrics import registry
+from .routers import replica_read_may_be_stale
+from .pagination import KeysetPagination, PostPagination, SearchPagination
+from .search import get_search_backend
 
 
 # Create your views here.
-class TaskPagination(PageNumberPagination):
+class TaskPagination(KeysetPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100  
 
 
-class NewsFeedView(generics.ListAPIView):
-    serializer_class = PostSerializer
+class SparseFieldsViewMixin:
+    """Narrows reads with ?fields= and ?expand= and loads only the columns they need."""
+
+    def get_field_selection(self):
+        if not hasattr(self, "_field_selection"):
+            self._field_selection = FieldSelection.from_request(self.request, self.get_serializer_class())
+        return self._field_selection
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.get_field_selection().serializer_kwargs())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.get_field_selection().restrict(queryset, self.get_serializer_class())
+
+
+class PostFragmentListMixin(SparseFieldsViewMixin):
+    """Builds post list pages from per-post cached fragments instead of serializing every row."""
+
+    def serialize_page(self, posts):
+        data = serialize_posts(
+            posts, self.get_serializer_class(), self.get_serializer_context(), self.get_field_selection()
+        )
+        return apply_pending_likes(data, self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_page(page))
+        return Response(self.serialize_page(list(queryset)))
+
+
+class NewsFeedView(ConditionalGetMixin, PostFragmentListMixin, generics.ListAPIView):
+    serializer_class = FeedPostSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = TaskPagination  
 
+    def get_validators(self, request):
+        """Validates pages by feed generation, which moves on every post, like and comment change.
+
+        Pages with the viewer's buffered likes, or read from a replica that may lag
+        the latest change, are not validated.
+        """
+        if has_pending_likes(request.user) or replica_read_may_be_stale():
+            return None, None
+        etag = quote_etag(f"feed-{get_feed_version()}-u{request.user.pk}")
+        changed_at = feed_changed_at()
+        return etag, datetime.fromtimestamp(changed_at, tz=timezone.utc) if changed_at is not None else None
+
     def get_queryset(self):
-        """Returns only public posts, sorted by creation date."""
+        """Returns public posts and the viewer's own private posts, newest first."""
         return (
             Post.objects
-            .filter(privacy="public")
-            .select_related("author")
-            .prefetch_related(Prefetch("comments"), Prefetch("likes"))
-            .order_by("-created_at")
+            .visible_to(self.request.user)
+            .select_related("author__profile")
+            .order_by("-created_at", "-id")
         )
 
     def list(self, request, *args, **kwargs):
-        """Caches paginated responses for improved performance."""
-        page_number = request.GET.get("page", 1)
-        cache_key = f"feed_page_{page_number}"
-        cached_data = cache.get(cache_key)
-
-        if cached_data:
-            return Response(cached_data)
-
-        response = super().list(request, *args, **kwargs)
-        cache.set(cache_key, response.data, timeout=300)  # Cache for 5 minutes
-
-        return response
+        """Caches paginated responses per feed version, viewer and page size.
+
+        Concurrent misses on a page are built once (see get_or_build). A viewer with
+        buffered likes bypasses the cache so they see their own likes.
+        """
+        if has_pending_likes(request.user):
+            response = self.list_from_timeline(request)
+            return response if response is not None else super().list(request, *args, **kwargs)
+
+        cursor = request.query_params.get(self.paginator.cursor_query_param)
+        if cursor is not None:
+            page_number = f"c{cursor}"
+        else:
+            page_number = request.query_params.get(self.paginator.page_query_param, 1)
+        page_size = self.paginator.get_page_size(request)
+        cache_key = feed_cache_key(request.user, page_number, page_size, variant=self.get_field_selection().key)
+        built = []
+
+        def build():
+            response = self.list_from_timeline(request)
+            if response is None:
+                response = super(NewsFeedView, self).list(request, *args, **kwargs)
+            built.append(response)
+            return response.data, not replica_read_may_be_stale()
+
+        data = get_or_build(cache_key, build, FEED_CACHE_TIMEOUT)
+        return built[0] if built else Response(data)
+
+    def public_count(self):
+        """Counts public posts once per feed generation, for pages of a truncated timeline."""
+        key = f"feed:v{get_feed_version()}:public_count"
+        return get_or_build(key, lambda: (Post.objects.filter(privacy="public").count(), True), FEED_CACHE_TIMEOUT)
+
+    def list_from_timeline(self, request):
+        """Serves a page as a slice of the global timeline plus one in_bulk fetch.
+
+        Returns None without a shared timeline backend (a per-process timeline
+        misses posts made by other workers), for cursor requests, pages past what
+        a truncated timeline holds and viewers with private posts of their own;
+        those fall back to the database query.
+        """
+        if not get_timeline_backend().shared or self.paginator.cursor_query_param in request.query_params:
+            return None
+        try:
+            page_number = int(request.query_params.get(self.paginator.page_query_param, 1))
+        except ValueError:
+            return None
+        page_size = self.paginator.get_page_size(request)
+        backend = warm_global_timeline()
+        held = backend.total(GLOBAL_TIMELINE)
+        truncated = backend.is_truncated(GLOBAL_TIMELINE)
+        if page_number < 1 or (truncated and page_number * page_size > held):
+            return None
+        if backend.total(warm_private_timeline(request.user)):
+            return None
+
+        post_ids = backend.range(GLOBAL_TIMELINE, (page_number - 1) * page_size, page_size)
+        queryset = Post.objects.filter(privacy="public").select_related("author__profile")
+        posts = self.get_field_selection().restrict(queryset, self.get_serializer_class()).in_bulk(post_ids)
+        page = [posts[pk] for pk in post_ids if pk in posts]
+        count = self.public_count() if truncated else held
+        return self.paginator.get_offset_response(request, self.serialize_page(page), page_number, count)
 
 
 User = get_user_model()
@@ -67,7 +185,9 @@ class GoogleLogin(SocialLoginView):
 
 
 # ✅ Post CRUD: Retrieve, Update, Delete
-class PostRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
+class PostRetrieveUpdateDeleteView(
+    SparseFieldsViewMixin, ConditionalUpdateMixin, generics.RetrieveUpdateDestroyAPIView
+):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -76,6 +196,17 @@ class PostRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
         """Restricts access to only the post owner."""
         return Post.objects.filter(author=self.request.user)
 
+    def get_validators(self, request):
+        return post_validators(self.get_object())
+
+    def perform_update(self, serializer):
+        invalidate_post_fragment(serializer.instance)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        invalidate_post_fragment(instance)
+        instance.delete()
+
 
 # ✅ User Role Management
 class UserRoleView(APIView):
@@ -101,33 +232,55 @@ class PostPrivacyUpdateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def patch(self, request, post_id):
-        """Allows the post owner to change privacy settings."""
-        post = get_object_or_404(Post, id=post_id)
+        """Allows the post owner to change privacy settings.
+
+        Honours If-Match / If-Unmodified-Since against the post's ETag, checked in
+        the same transaction as the write.
+        """
+        with transaction.atomic():
+            post = get_object_or_404(Post.objects.select_for_update(), id=post_id)
+
+            if post.author != request.user:
+                raise PermissionDenied("You can only update your own post's privacy settings.")
 
-        if post.author != request.user:
-            raise PermissionDenied("You can only update your own post's privacy settings.")
+            precondition_failed = check_preconditions(request, *post_validators(post))
+            if precondition_failed is not None:
+                return precondition_failed
 
-        new_privacy = request.data.get("privacy")
-        if new_privacy not in ["public", "private"]:
-            return Response({"error": "Invalid privacy setting."}, status=400)
+            new_privacy = request.data.get("privacy")
+            if new_privacy not in ["public", "private"]:
+                return Response({"error": "Invalid privacy setting."}, status=400)
 
-        post.privacy = new_privacy
-        post.save()
+            invalidate_post_fragment(post)
+            post.privacy = new_privacy
+            post.save()
 
-        return Response({"message": f"Post privacy updated to '{new_privacy}'."})
+        response = Response({"message": f"Post privacy updated to '{new_privacy}'."})
+        return set_validators(response, *post_validators(post))
 
 
 # ✅ Create & List Posts
-class PostListCreateView(generics.ListCreateAPIView):
+class PostListCreateView(PostFragmentListMixin, generics.ListCreateAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PostPagination
+
+    def get_queryset(self):
+        """Posts the user may see with their authors, newest first."""
+        return (
+            Post.objects.visible_to(self.request.user)
+            .select_related("author__profile")
+            .order_by("-created_at", "-id")
+        )
 
     def perform_create(self, serializer):
         """Uses PostFactory to create posts while enforcing business rules."""
-        post = PostFactory.create_post(author=self.request.user, **serializer.validated_data)
-        serializer.save(instance=post)
-        cache.delete("feed_page_*")  # Invalidate cached feed pages
+        try:
+            post = PostFactory.create_post(author=self.request.user, **serializer.validated_data)
+        except PostQuotaExceeded as exc:
+            raise PermissionDenied(str(exc))
+        serializer.instance = post
 
 
 # ✅ Like a Post
@@ -136,9 +289,8 @@ class LikePostView(APIView):
 
     def post(self, request, post_id):
         """Allows users to like a post."""
-        post = get_object_or_404(Post, id=post_id)
-        Like.objects.get_or_create(user=request.user, post=post)
-        cache.delete("feed_page_*")  # Invalidate cached feed pages
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        ingest_like(request.user, post, liked=True)
         return Response({"message": "Post liked!"})
 
 
@@ -148,9 +300,8 @@ class UnlikePostView(APIView):
 
     def post(self, request, post_id):
         """Allows users to unlike a post."""
-        post = get_object_or_404(Post, id=post_id)
-        Like.objects.filter(user=request.user, post=post).delete()
-        cache.delete("feed_page_*")  # Invalidate cached feed pages
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        ingest_like(request.user, post, liked=False)
         return Response({"message": "Post unliked!"})
 
 
@@ -160,56 +311,240 @@ class CommentPostView(APIView):
 
     def post(self, request, post_id):
         """Allows users to comment on a post."""
-        post = get_object_or_404(Post, id=post_id)
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
         comment_text = request.data.get("comment")
 
         if not comment_text:
             return Response({"error": "Comment cannot be empty."}, status=400)
 
-        Comment.objects.create(user=request.user, post=post, text=comment_text)
-        cache.delete("feed_page_*")  # Invalidate cached feed pages
+        comment_on_post(request.user, post, comment_text)
         return Response({"message": "Comment added!"})
 
 
+# ✅ Batch Likes, Unlikes & Comments
+class BatchInteractionView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    max_operations = 500
+
+    def post(self, request):
+        """Applies a list of like, unlike and comment operations in one transaction.
+
+        The number of queries is fixed regardless of batch size: one post lookup,
+        one existing-like lookup, one bulk insert per model, one re-select of the
+        inserted likes, one delete and one counter update. With buffered like
+        ingestion, likes and unlikes go to the buffer instead.
+        """
+        operations = request.data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return Response({"error": "Provide a non-empty 'operations' list."}, status=400)
+        if len(operations) > self.max_operations:
+            return Response({"error": f"At most {self.max_operations} operations per batch."}, status=400)
+
+        user = request.user
+        results = []
+        valid = []
+        for index, item in enumerate(operations):
+            serializer = BatchOperationSerializer(data=item if isinstance(item, dict) else {})
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+                results.append({"index": index, "status": "ok"})
+            else:
+                results.append({"index": index, "status": "error", "errors": serializer.errors})
+
+        posts = Post.objects.visible_to(user).in_bulk({data["post"] for _, data in valid})
+
+        # The last like/unlike per post wins; comments are all kept.
+        like_state = {}
+        comments = []
+        for index, data in valid:
+            if data["post"] not in posts:
+                results[index] = {"index": index, "status": "error", "errors": "Post not found."}
+            elif data["op"] == "comment":
+                comments.append(Comment(user=user, post_id=data["post"], content=data["comment"]))
+            else:
+                like_state[data["post"]] = data["op"] == "like"
+
+        if get_like_buffer() is not None:
+            for post_id, liked in like_state.items():
+                ingest_like(user, posts[post_id], liked)
+            like_state = {}
+
+        with transaction.atomic():
+            liked = dict(
+                Like.objects.filter(user=user, post_id__in=like_state).values_list("post_id", "pk")
+            )
+            to_like = [post_id for post_id, state in like_state.items() if state and post_id not in liked]
+            to_unlike = [post_id for post_id, state in like_state.items() if not state and post_id in liked]
+
+            # Counters move by the rows this request actually wrote, not by what it
+            # expected to write: a concurrent like or unlike may have got there first.
+            like_delta = {}
+            if to_like:
+                created = {
+                    like.post_id: like.created_at
+                    for like in Like.objects.bulk_create(
+                        [Like(user=user, post_id=post_id) for post_id in to_like], ignore_conflicts=True
+                    )
+                }
+                # Conflicting rows keep the other writer's created_at, so only ours match.
+                for post_id, created_at in Like.objects.filter(
+                    user=user, post_id__in=to_like
+                ).values_list("post_id", "created_at"):
+                    if created[post_id] == created_at:
+                        like_delta[post_id] = 1
+            recount = []
+            if to_unlike:
+                deleted, _ = Like.objects.filter(pk__in=[liked[post_id] for post_id in to_unlike]).delete()
+                if deleted == len(to_unlike):
+                    like_delta.update({post_id: -1 for post_id in to_unlike})
+                else:
+                    # Another request removed some of these likes first; count them instead.
+                    recount = to_unlike
+            if comments:
+                Comment.objects.bulk_create(comments)
+
+            comment_delta = {}
+            for comment in comments:
+                comment_delta[comment.post_id] = comment_delta.get(comment.post_id, 0) + 1
+            touched = set(like_delta) | set(comment_delta) | set(recount)
+            if like_delta or comment_delta:
+                Post.objects.filter(pk__in=set(like_delta) | set(comment_delta)).update(
+                    likes_count=F("likes_count") + counter_delta_case(like_delta),
+                    comments_count=F("comments_count") + counter_delta_case(comment_delta),
+                )
+            if recount:
+                Post.objects.filter(pk__in=recount).update(likes_count=Post.objects.real_counts()["likes_count"])
+
+        if touched:
+            # bulk_create skips the model signals that normally move the feed generation.
+            transaction.on_commit(bump_feed_version)
+            invalidate_post_fragments([posts[post_id] for post_id in touched])
+
+        return Response({"results": results})
+
+
 # ✅ Retrieve Post Comments
-class PostCommentsView(generics.ListAPIView):
+class PostCommentsView(ConditionalGetMixin, SparseFieldsViewMixin, generics.ListAPIView):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PostPagination
+
+    def get_validators(self, request):
+        """Validates by comment count and last comment change, read in one query with the visibility check.
+
+        New and edited comments move the newest ``updated_at``; deletes lower the
+        count. Deletes leave no timestamp behind, so there is no Last-Modified.
+        """
+        post_id = self.kwargs["post_id"]
+        changed = Comment.objects.filter(post=OuterRef("pk")).order_by("-updated_at").values("updated_at")[:1]
+        row = (
+            Post.objects.visible_to(request.user).filter(pk=post_id)
+            .annotate(changed=Subquery(changed)).values_list("comments_count", "changed").first()
+        )
+        if row is None:
+            return None, None
+        count, changed = row
+        stamp = int(changed.timestamp() * 1_000_000) if changed is not None else 0
+        return quote_etag(f"comments-{post_id}-{count}-{stamp}"), None
 
     def get_queryset(self):
-        """Retrieve comments for a specific post."""
+        """Retrieve comments for a specific post the user may see."""
         post_id = self.kwargs["post_id"]
-        return Comment.objects.filter(post_id=post_id).select_related("user")
+        return (
+            Comment.objects
+            .filter(post_id=post_id, post__in=Post.objects.visible_to(self.request.user).filter(pk=post_id))
+            .select_related("user__profile")
+            .order_by("-created_at", "-id")
+        )
+
+
+# ✅ Full-Text Post Search
+class PostSearchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SearchPagination
+
+    def get(self, request):
+        """Ranks posts matching ?q= that the user may see, best match first, in cursor pages."""
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            return Response({"error": "Provide a search query with ?q=."}, status=400)
+
+        paginator = self.pagination_class()
+        paginator.request = request
+        page_size = paginator.get_page_size(request)
+        position = paginator.decode_cursor(request.query_params.get(paginator.cursor_query_param, ""))
+
+        hits = get_search_backend().search(text, request.user, position, page_size + 1)
+        paginator.next_position = None
+        if len(hits) > page_size:
+            hits = hits[:page_size]
+            last_pk, last_rank = hits[-1]
+            paginator.next_position = (last_rank, last_pk)
+
+        selection = FieldSelection.from_request(request, PostSerializer)
+        queryset = Post.objects.visible_to(request.user).select_related("author__profile")
+        posts = selection.restrict(queryset, PostSerializer).in_bulk([pk for pk, _ in hits])
+        page = [posts[pk] for pk, _ in hits if pk in posts]
+        context = {"request": request, "view": self}
+        return Response({
+            "next": paginator.get_next_cursor_link(),
+            "results": apply_pending_likes(serialize_posts(page, PostSerializer, context, selection), request.user),
+        })
+
+
+# ✅ Streaming NDJSON Export
+class PostExportView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """Streams every post, or those changed since ?since=<ISO datetime>, as NDJSON."""
+        since = request.query_params.get("since")
+        if since is not None:
+            since = parse_datetime(since)
+            if since is None:
+                return Response({"error": "'since' must be an ISO 8601 datetime."}, status=400)
+        response = StreamingHttpResponse(iter_ndjson(since), content_type="application/x-ndjson")
+        response["Content-Disposition"] = 'attachment; filename="posts.ndjson"'
+        return response
 
 
 # ✅ Singleton Pattern for Post Configuration
 class SingletonConfigView(APIView):
     """Uses Singleton to manage global post configurations."""
 
+    def get_permissions(self):
+        # Updates apply to every worker, so only admins may make them.
+        if self.request.method == "POST":
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
     def get(self, request):
         config = PostConfigManager()
-        return Response({"message": "Singleton config retrieved!", "data": config.get_config()})
+        return Response({
+            "message": "Singleton config retrieved!", "data": dict(config.get_config()), "version": config.version,
+        })
 
     def post(self, request):
         """Update singleton config settings."""
         new_config = request.data.get("config")
         config = PostConfigManager()
-        config.update_config(new_config)
-        return Response({"message": "Singleton config updated!", "data": config.get_config()})
-
-
-
-
-
-
-
-
-
-
-
-
+        try:
+            data = config.update_config(new_config)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        return Response({"message": "Singleton config updated!", "data": dict(data), "version": config.version})
 
 
+# ✅ Prometheus Metrics
+class MetricsView(APIView):
+    """Exposes request metrics in Prometheus text format to staff users.
 
+    Scrapers authenticate with a staff user's token (``Authorization: Token ...``).
+    The client address is not trusted: behind a proxy on the same host every
+    request arrives from 127.0.0.1.
+    """
+    permission_classes = [permissions.IsAdminUser]
 
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 